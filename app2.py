@@ -3,12 +3,39 @@ from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Literal, Optional, AsyncGenerator
+import os
 import json
+import uuid
 import asyncio
+import logging
 from queue import Queue
 from threading import Thread
 
-from deepr_withref import research_legal_query
+from startup import startup_timings, timed
+
+with timed("import:deepr_withref"):
+    from deepr_withref import research_legal_query, warm_up
+from rate_limit import rate_limit_metrics
+from circuit_breaker import circuit_breaker_metrics
+from blob_store import blob_store
+from shared_store import DEFAULT_STORE_PATH, JobStore
+from worker_pool import ResearchWorkerPool
+
+# "thread" runs research in a thread of the API process, "process" runs it in a
+# pool of worker processes so runs do not share the API process's GIL.
+EXECUTION_MODE = os.getenv("RESEARCH_EXECUTION_MODE", "thread")
+RESEARCH_WORKERS = int(os.getenv("RESEARCH_WORKERS", str(os.cpu_count() or 1)))
+RESEARCH_TIMEOUT = 300
+BLOB_TTL = float(os.getenv("BLOB_TTL", "604800"))
+BLOB_PRUNE_INTERVAL = float(os.getenv("BLOB_PRUNE_INTERVAL", "3600"))
+# Build the agent dependencies in the background once the server is accepting
+# connections, so the first request does not pay for them.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+
+logger = logging.getLogger("uvicorn.error")
+
+job_store = JobStore(DEFAULT_STORE_PATH)
+worker_pool: Optional[ResearchWorkerPool] = None
 
 app = FastAPI(
     title="Indian Legal Research API",
@@ -22,6 +49,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Job-Id", "X-Session-Id"],
 )
 
 
@@ -31,6 +59,11 @@ class ResearchRequest(BaseModel):
         default="normal",
         description="Research mode: 'normal' for optimal response, 'detailed' for comprehensive analysis"
     )
+    session_id: Optional[str] = Field(
+        default=None,
+        description="Conversation session id; follow-up questions in the same session reuse earlier research. "
+                    "A new session is started when omitted and its id is returned in the X-Session-Id header"
+    )
     
     class Config:
         json_schema_extra = {
@@ -47,60 +80,139 @@ class HealthResponse(BaseModel):
     version: str
 
 
-def run_research_in_thread(query: str, mode: str, result_queue: Queue):
+def run_research_in_thread(job_id: str, query: str, mode: str, session_id: str, result_queue: Queue):
     """Execute research in separate thread"""
+    job_store.update(job_id, "running", worker_pid=os.getpid())
     try:
-        result = research_legal_query(query=query, verbose=False, mode=mode)
+        result = research_legal_query(
+            query=query,
+            verbose=False,
+            mode=mode,
+            on_event=lambda event: job_store.add_event(job_id, event),
+            session_id=session_id,
+        )
+        job_store.update(job_id, "completed", result=result)
         result_queue.put({"success": True, "data": result})
     except Exception as e:
+        job_store.update(job_id, "failed", error=str(e))
         result_queue.put({"success": False, "error": str(e)})
 
 
-async def stream_research_result(query: str, mode: str) -> AsyncGenerator[str, None]:
+def format_research_result(result: Optional[dict]) -> str:
+    """Turn a research outcome into the JSON body returned to the client"""
+    if result is None:
+        return json.dumps({
+            "error": "No response generated",
+            "details": "Agent completed but produced no output"
+        })
+    
+    if result["success"]:
+        try:
+            parsed = json.loads(result["data"])
+            return json.dumps(parsed, indent=2)
+        except json.JSONDecodeError:
+            return json.dumps({
+                "error": "Invalid JSON response",
+                "raw_response": result["data"]
+            })
+    
+    return json.dumps({
+        "error": "Research execution failed",
+        "details": result.get("error", "Unknown error")
+    })
+
+
+def timeout_response() -> str:
+    return json.dumps({
+        "error": "Request timeout",
+        "details": "Research took longer than 5 minutes"
+    })
+
+
+async def stream_research_result(job_id: str, query: str, mode: str, session_id: str) -> AsyncGenerator[str, None]:
     """Stream research results as they become available"""
     
     result_queue = Queue()
-    thread = Thread(target=run_research_in_thread, args=(query, mode, result_queue))
+    thread = Thread(target=run_research_in_thread, args=(job_id, query, mode, session_id, result_queue))
     thread.start()
     
-    timeout = 300
     start_time = asyncio.get_event_loop().time()
     
     while thread.is_alive():
         current_time = asyncio.get_event_loop().time()
-        if current_time - start_time > timeout:
-            yield json.dumps({
-                "error": "Request timeout",
-                "details": "Research took longer than 5 minutes"
-            })
+        if current_time - start_time > RESEARCH_TIMEOUT:
+            job_store.update(job_id, "timeout")
+            yield timeout_response()
             return
         
         await asyncio.sleep(0.5)
     
     thread.join()
     
-    if not result_queue.empty():
-        result = result_queue.get()
-        
-        if result["success"]:
-            try:
-                parsed = json.loads(result["data"])
-                yield json.dumps(parsed, indent=2)
-            except json.JSONDecodeError:
-                yield json.dumps({
-                    "error": "Invalid JSON response",
-                    "raw_response": result["data"]
-                })
-        else:
-            yield json.dumps({
-                "error": "Research execution failed",
-                "details": result.get("error", "Unknown error")
-            })
-    else:
-        yield json.dumps({
-            "error": "No response generated",
-            "details": "Agent completed but produced no output"
-        })
+    yield format_research_result(result_queue.get() if not result_queue.empty() else None)
+
+
+async def stream_research_result_from_pool(job_id: str, query: str, mode: str, session_id: str) -> AsyncGenerator[str, None]:
+    """Run research in the worker pool and stream the result back"""
+    try:
+        data = await worker_pool.run(job_id, query, mode, session_id, timeout=RESEARCH_TIMEOUT)
+        result = {"success": True, "data": data}
+    except asyncio.TimeoutError:
+        yield timeout_response()
+        return
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+    
+    yield format_research_result(result)
+
+
+@app.on_event("startup")
+async def start_worker_pool():
+    global worker_pool
+    if EXECUTION_MODE == "process":
+        worker_pool = ResearchWorkerPool(workers=RESEARCH_WORKERS, store_path=DEFAULT_STORE_PATH)
+
+
+def run_in_background(name: str, fn, *args):
+    """Run fn in the default executor without awaiting it, logging any failure."""
+    def log_failure(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Background task %s failed", name, exc_info=future.exception())
+    
+    asyncio.get_running_loop().run_in_executor(None, fn, *args).add_done_callback(log_failure)
+
+
+async def prune_blob_store_periodically():
+    while True:
+        try:
+            await asyncio.to_thread(blob_store.prune, BLOB_TTL)
+        except Exception:
+            logger.exception("Blob store pruning failed")
+        await asyncio.sleep(BLOB_PRUNE_INTERVAL)
+
+
+@app.on_event("startup")
+async def prune_blob_store():
+    # Not awaited: startup completes (and the port is bound) without waiting on it.
+    app.state.blob_pruner = asyncio.create_task(prune_blob_store_periodically())
+
+
+@app.on_event("startup")
+async def warm_up_agent():
+    # In process mode the worker pool warms up its own processes.
+    if WARMUP_ON_STARTUP and worker_pool is None:
+        run_in_background("warm-up", warm_up)
+
+
+@app.on_event("shutdown")
+async def stop_blob_pruner():
+    app.state.blob_pruner.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_worker_pool():
+    if worker_pool is not None:
+        worker_pool.shutdown()
 
 
 @app.post(
@@ -121,12 +233,30 @@ async def research_endpoint(request: ResearchRequest):
     if not request.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
+    job_id = job_store.create(request.query, request.mode)
+    session_id = request.session_id or uuid.uuid4().hex
+    stream = stream_research_result_from_pool if worker_pool is not None else stream_research_result
+    
     return StreamingResponse(
-        stream_research_result(request.query, request.mode),
-        media_type="application/json"
+        stream(job_id, request.query, request.mode, session_id),
+        media_type="application/json",
+        headers={"X-Job-Id": job_id, "X-Session-Id": session_id}
     )
 
 
+@app.get(
+    "/jobs/{job_id}",
+    summary="Research job status",
+    description="Return the status, progress events and result of a research job"
+)
+async def job_status(job_id: str):
+    """Look up a research job in the shared job store"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @app.get(
     "/health",
     response_model=HealthResponse,
@@ -142,6 +272,25 @@ async def health_check():
     )
 
 
+@app.get(
+    "/metrics",
+    summary="Upstream rate limiter, circuit breaker and startup metrics",
+    description="Calls, 429s, retries, limiter wait time, concurrency limits, circuit breaker state "
+                "and import/initialization time per component. In process execution mode upstream "
+                "calls run in the workers, whose metrics are reported per process under 'workers'"
+)
+async def metrics():
+    """Metrics of the upstream rate limiters, circuit breakers and startup of the API process and workers"""
+    body = {
+        "rate_limiters": rate_limit_metrics(),
+        "circuit_breakers": circuit_breaker_metrics(),
+        "startup": startup_timings()
+    }
+    if worker_pool is not None:
+        body["workers"] = await asyncio.to_thread(worker_pool.metrics)
+    return body
+
+
 @app.get("/")
 async def root():
     """API information and available endpoints"""
@@ -151,14 +300,17 @@ async def root():
         "description": "AI-powered legal research for Indian law",
         "endpoints": {
             "POST /research": "Perform legal research (supports 'normal' and 'detailed' modes)",
+            "GET /jobs/{job_id}": "Research job status and progress events",
             "GET /health": "Health check",
+            "GET /metrics": "Upstream rate limiter, circuit breaker and startup metrics",
             "GET /docs": "Interactive API documentation"
         },
         "modes": {
             "normal": "Optimal, concise research response",
             "detailed": "Comprehensive, extensive analysis"
         },
-        "timeout": "5 minutes per request"
+        "timeout": "5 minutes per request",
+        "execution_mode": EXECUTION_MODE
     }
 
 
@@ -0,0 +1,137 @@
+import os
+import mmap
+import time
+import re
+import hashlib
+import resource
+import tempfile
+import threading
+from contextvars import ContextVar
+from typing import Optional
+
+
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "deepr_blobs")
+# Content larger than this (in bytes) is always kept out of agent state.
+SPILL_THRESHOLD = int(os.getenv("BLOB_SPILL_THRESHOLD", "4096"))
+# Once a run holds this many bytes of inline content, everything else is spilled.
+RUN_MEMORY_CAP = int(os.getenv("RUN_MEMORY_CAP", str(2 * 1024 * 1024)))
+PREVIEW_CHARS = int(os.getenv("BLOB_PREVIEW_CHARS", "600"))
+
+
+class BlobStore:
+    """Content-addressed blobs on local disk, read back through memory maps."""
+
+    def __init__(self, root: str = BLOB_STORE_PATH):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        # Digests come back from the model, so anything but a sha256 hex digest is refused.
+        if not isinstance(digest, str) or not re.fullmatch(r"[0-9a-f]{64}", digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def put(self, text: str) -> str:
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            # Rewriting an existing blob counts as a fresh write for prune().
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent writers never expose a partial blob.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def size(self, digest: str) -> int:
+        return os.path.getsize(self._path(digest))
+
+    def read(self, digest: str, offset: int = 0, length: Optional[int] = None) -> str:
+        """Read length bytes starting at offset (the whole blob by default)."""
+        offset = max(0, offset)
+        if length is not None:
+            length = max(0, length)
+        with open(self._path(digest), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                end = len(mapped) if length is None else offset + length
+                return mapped[offset:end].decode("utf-8", errors="ignore")
+
+    def prune(self, max_age: float):
+        """Delete blobs not written for max_age seconds."""
+        cutoff = time.time() - max_age
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+
+class RunMemory:
+    """Per-run accounting of content kept inline in agent state versus spilled to the blob store."""
+
+    def __init__(self, cap: int = RUN_MEMORY_CAP):
+        self.cap = cap
+        self.inline_bytes = 0
+        self.spilled_bytes = 0
+        self.blobs = 0
+        self._lock = threading.Lock()
+
+    def should_spill(self, size: int) -> bool:
+        with self._lock:
+            return size > SPILL_THRESHOLD or self.inline_bytes + size > self.cap
+
+    def record_inline(self, size: int):
+        with self._lock:
+            self.inline_bytes += size
+
+    def record_spill(self, size: int):
+        with self._lock:
+            self.spilled_bytes += size
+            self.blobs += 1
+
+    def summary(self) -> dict:
+        return {
+            "inline_bytes": self.inline_bytes,
+            "spilled_bytes": self.spilled_bytes,
+            "blobs": self.blobs,
+            "memory_cap_bytes": self.cap,
+            # Process-wide high-water mark (it never decreases and covers every run
+            # sharing the process); per-run usage is the inline/spilled bytes above.
+            # Linux reports ru_maxrss in kilobytes.
+            "process_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+
+blob_store = BlobStore()
+
+# Set by research_legal_query; tool calls run in a copy of the caller's context.
+current_run_memory: ContextVar[Optional[RunMemory]] = ContextVar("current_run_memory", default=None)
+
+
+def spill_text(text: str) -> dict:
+    """
+    Keep text inline if the run's budget allows, otherwise store it as a blob.
+
+    Returns {"text": ...} or a lightweight handle {"source_id", "size", "preview"}.
+    """
+    run_memory = current_run_memory.get() or RunMemory()
+    size = len(text.encode("utf-8"))
+    if not run_memory.should_spill(size):
+        run_memory.record_inline(size)
+        return {"text": text}
+
+    run_memory.record_spill(size)
+    return {
+        "source_id": blob_store.put(text),
+        "size": size,
+        "preview": text[:PREVIEW_CHARS],
+    }
@@ -0,0 +1,92 @@
+import os
+import time
+import threading
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one upstream.
+
+    closed:    calls flow normally; consecutive failures (errors, or calls slower
+               than latency_threshold) are counted.
+    open:      after failure_threshold consecutive failures calls are refused
+               immediately so callers can fall back, until reset_timeout passes.
+    half_open: a single probe call is let through; success closes the circuit,
+               failure reopens it for another reset_timeout.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        latency_threshold: float = 20.0,
+        reset_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._times_opened = 0
+        self._rejected = 0
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self, latency: float):
+        if latency > self.latency_threshold:
+            self.record_failure()
+            return
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self._times_opened += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "times_opened": self._times_opened,
+                "rejected": self._rejected,
+            }
+
+
+search_breaker = CircuitBreaker(
+    "tavily",
+    failure_threshold=int(os.getenv("SEARCH_BREAKER_FAILURES", "5")),
+    latency_threshold=float(os.getenv("SEARCH_BREAKER_LATENCY", "20")),
+    reset_timeout=float(os.getenv("SEARCH_BREAKER_RESET", "30")),
+)
+
+
+def circuit_breaker_metrics() -> dict:
+    return {search_breaker.name: search_breaker.metrics()}
@@ -1,21 +1,368 @@
 import os
-from typing import Literal, Optional
-from tavily import TavilyClient
-from deepagents import create_deep_agent
-from langchain_openai import ChatOpenAI
+from typing import Callable, Literal, Optional
 from dotenv import load_dotenv
 import sys
 import json
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextvars import ContextVar, copy_context
+from functools import lru_cache
+
+from startup import Lazy, startup_timings, timed
+
+# Loaded before the local modules, which read their settings from the environment at import.
+with timed("init:dotenv"):
+    load_dotenv()
+
+with timed("import:local_modules"):
+    from blob_store import PREVIEW_CHARS, SPILL_THRESHOLD, RunMemory, blob_store, current_run_memory, spill_text
+    from circuit_breaker import CircuitOpenError, search_breaker
+    from json_repair import (
+        load_research_json,
+        parse_research_response,
+        prune_dangling_refs,
+        validate_research_response,
+    )
+    from prefetch import SEARCH_PREFETCH, SearchPrefetcher, current_prefetcher
+    from rate_limit import openai_limiter, tavily_limiter
+    from retrieval import SEARCH_COVERAGE_THRESHOLD, coverage, escalation_steps, query_terms
+    from sessions import (
+        RunDocuments,
+        current_run_documents,
+        followup_messages,
+        new_session,
+        session_files,
+        update_session,
+    )
+    from shared_store import DEFAULT_STORE_PATH, SearchCache, SessionStore
+
+# Expired entries younger than this are served immediately while a background
+# refresh runs, and any cached entry is served while the search circuit is open.
+SEARCH_STALE_TTL = float(os.getenv("SEARCH_STALE_TTL", "604800"))
+
+# Backed by a SQLite file so every worker process shares the same cache.
+with timed("init:stores"):
+    search_cache = SearchCache(
+        os.getenv("SEARCH_CACHE_PATH", DEFAULT_STORE_PATH),
+        ttl=float(os.getenv("SEARCH_CACHE_TTL", "86400")),
+        max_age=SEARCH_STALE_TTL,
+    )
+    session_store = SessionStore(
+        os.getenv("SESSION_STORE_PATH", DEFAULT_STORE_PATH),
+        ttl=float(os.getenv("SESSION_TTL", "86400")),
+        max_bytes=int(os.getenv("SESSION_STORE_MAX_BYTES", str(256 * 1024 * 1024))),
+    )
+
+SEARCH_TIMEOUT = int(os.getenv("SEARCH_TIMEOUT", "30"))
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+# The API clients and the heavy agent dependencies (tavily, langchain_openai,
+# deepagents, langgraph) are imported and constructed on first use, so that
+# importing this module stays cheap. warm_up() builds everything up front.
+def _build_tavily_client():
+    with timed("import:tavily"):
+        from tavily import TavilyClient
+    
+    # TAVILY_API_BASE_URL lets load tests point the client at a local stand-in.
+    return TavilyClient(
+        api_key=os.getenv("TAVILY_API_KEY"),
+        **({"api_base_url": os.getenv("TAVILY_API_BASE_URL")} if os.getenv("TAVILY_API_BASE_URL") else {}),
+    )
+
+
+@lru_cache(maxsize=None)
+def _rate_limited_chat_openai_class():
+    with timed("import:langchain_openai"):
+        from langchain_openai import ChatOpenAI
+    
+    class RateLimitedChatOpenAI(ChatOpenAI):
+        """ChatOpenAI whose requests go through the process-wide OpenAI rate limiter."""
+        
+        def _generate(self, *args, **kwargs):
+            return openai_limiter.call(super()._generate, *args, **kwargs)
+    
+    return RateLimitedChatOpenAI
+
+
+def _build_openai_model():
+    # Retries are left to the rate limiter (max_retries=0) so that 429s feed its
+    # concurrency limit instead of being retried in lockstep by the client.
+    return _rate_limited_chat_openai_class()(
+        model="gpt-4.1-mini",
+        temperature=0.4,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL"),
+        max_retries=0,
+    )
+
+
+def _build_json_fix_model():
+    # Only used when the final answer is malformed JSON that local repair cannot fix.
+    return _rate_limited_chat_openai_class()(
+        model=os.getenv("JSON_FIX_MODEL", "gpt-4.1-nano"),
+        temperature=0,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL"),
+        max_retries=0,
+    )
+
+
+_tavily_client = Lazy("tavily_client", _build_tavily_client)
+_openai_model = Lazy("openai_model", _build_openai_model)
+_json_fix_model = Lazy("json_fix_model", _build_json_fix_model)
+
+
+def get_tavily_client():
+    return _tavily_client.get()
+
+
+def get_openai_model():
+    return _openai_model.get()
+
+
+def get_json_fix_model():
+    return _json_fix_model.get()
+
+
+def __getattr__(name: str):
+    # Keeps `deepr_withref.openai_model` and friends working without eager construction.
+    lazy_attributes = {
+        "tavily_client": get_tavily_client,
+        "openai_model": get_openai_model,
+        "json_fix_model": get_json_fix_model,
+    }
+    if name in lazy_attributes:
+        return lazy_attributes[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _fetch_search(params: dict) -> dict:
+    """
+    Call Tavily through the rate limiter and cache the result. Every attempt is
+    recorded on the circuit breaker on its own, timed around the client call
+    only, so limiter waits and retry backoff never count as upstream slowness.
+    Retries stop as soon as the circuit opens.
+    """
+    attempts = 0
+    
+    def attempt():
+        nonlocal attempts
+        if attempts and search_breaker.state == "open":
+            raise CircuitOpenError(search_breaker.name)
+        attempts += 1
+        start = time.monotonic()
+        try:
+            search_results = get_tavily_client().search(
+                params["query"],
+                max_results=params["max_results"],
+                include_raw_content=params["include_raw_content"],
+                exclude_domains=params["exclude_domains"],
+                topic=params["topic"],
+                timeout=SEARCH_TIMEOUT,
+            )
+        except Exception:
+            search_breaker.record_failure()
+            raise
+        search_breaker.record_success(time.monotonic() - start)
+        return search_results
+    
+    search_results = _cacheable(tavily_limiter.call(attempt))
+    search_cache.set(params, search_results)
+    return search_results
 
-load_dotenv()
 
-tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+def _cacheable(search_results: dict) -> dict:
+    """
+    The search result as cached and returned: raw pages too large to ever stay
+    inline are stored once, in the blob store, and replaced by handles.
+    """
+    results = []
+    for result in search_results.get("results", []):
+        raw_content = result.get("raw_content")
+        if isinstance(raw_content, str):
+            size = len(raw_content.encode("utf-8"))
+            if size > SPILL_THRESHOLD:
+                result = {
+                    **result,
+                    "raw_content": None,
+                    "raw_content_source_id": blob_store.put(raw_content),
+                    "raw_content_size": size,
+                    "raw_content_preview": raw_content[:PREVIEW_CHARS],
+                }
+        results.append(result)
+    return {**search_results, "results": results}
+
+
+def _refresh_in_background(params: dict):
+    key = search_cache.make_key(params)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    
+    def refresh():
+        try:
+            _fetch_search(params)
+        except Exception:
+            pass
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+    
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def _search_fallback(params: dict, reason: str) -> dict:
+    """Serve a stale cached result, or a structured 'search unavailable' result the agent can reason about."""
+    cached, age = search_cache.get_with_age(params)
+    if cached is not None:
+        return {**cached, "stale": True, "cached_age_seconds": int(age)}
+    return {
+        "query": params["query"],
+        "results": [],
+        "search_unavailable": True,
+        "reason": reason,
+        "message": (
+            "The search backend is temporarily unavailable. Continue with sources already gathered, "
+            "answer from established law where you are confident, and state clearly which points "
+            "could not be verified against fresh search results."
+        ),
+    }
 
-openai_model = ChatOpenAI(
-    model="gpt-4.1-mini",
-    temperature=0.4,
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
+
+def _search_params(enhanced_query: str, max_results: int, include_raw_content: bool = True) -> dict:
+    return {
+        "query": enhanced_query,
+        "max_results": max_results,
+        "include_raw_content": include_raw_content,
+        "exclude_domains": ["indiankanoon.org"],
+        "topic": "general",
+    }
+
+
+def _run_search(params: dict) -> dict:
+    """Run a Tavily search with caching, stale-while-revalidate and a circuit breaker."""
+    cached, age = search_cache.get_with_age(params)
+    if cached is not None and age <= search_cache.ttl:
+        return cached
+    
+    if not search_breaker.allow_request():
+        return _search_fallback(params, "circuit open")
+    
+    if cached is not None and age <= SEARCH_STALE_TTL and search_breaker.state == "closed":
+        _refresh_in_background(params)
+        return cached
+    
+    try:
+        return _fetch_search(params)
+    except Exception as e:
+        return _search_fallback(params, str(e))
+
+
+def _search(enhanced_query: str, max_results: int, include_raw_content: bool = True):
+    """Search, taking the run's speculative prefetch for the same request if there is one."""
+    _raise_if_cancelled()
+    params = _search_params(enhanced_query, max_results, include_raw_content)
+    prefetcher = current_prefetcher.get()
+    if prefetcher is not None:
+        prefetched = prefetcher.take(params)
+        if prefetched is not None:
+            return prefetched
+    return _run_search(params)
+
+
+def _spill_raw_content(search_results: dict) -> dict:
+    """Replace large raw page contents with blob-store handles the agent can read via read_source."""
+    run_memory = current_run_memory.get()
+    results = []
+    for result in search_results.get("results", []):
+        raw_content = result.get("raw_content")
+        if result.get("raw_content_source_id") and run_memory is not None:
+            # Already spilled when the search was cached.
+            run_memory.record_spill(result.get("raw_content_size", 0))
+        elif isinstance(raw_content, str) and raw_content:
+            stored = spill_text(raw_content)
+            if "source_id" in stored:
+                result = {
+                    **result,
+                    "raw_content": None,
+                    "raw_content_source_id": stored["source_id"],
+                    "raw_content_size": stored["size"],
+                    "raw_content_preview": stored["preview"],
+                }
+        results.append(result)
+    return {**search_results, "results": results}
+
+
+def _adaptive_search(query: str, enhanced_query: str, max_results: int, include_raw_content: bool = True):
+    """
+    Fetch a small result set first and escalate to max_results only when
+    local coverage of the query (term coverage, authoritative domains,
+    relevance) is insufficient. Reports how many results were actually fetched.
+    """
+    steps = escalation_steps(max_results)
+    kept = None
+    for step, count in enumerate(steps):
+        search_results = _search(enhanced_query, count, include_raw_content)
+        # A degraded escalation (stale or unavailable) never replaces results already in hand.
+        if search_results.get("search_unavailable") or (kept is not None and search_results.get("stale")):
+            break
+        search_results = _spill_raw_content(search_results)
+        
+        results = search_results.get("results", [])
+        run_documents = current_run_documents.get()
+        if run_documents is not None:
+            run_documents.add(results)
+        query_coverage = coverage(query, results)
+        kept = (step, search_results, results, query_coverage)
+        # Fewer results than requested means the backend has nothing more to give.
+        if len(results) < count or query_coverage["score"] >= SEARCH_COVERAGE_THRESHOLD:
+            break
+    
+    if kept is None:
+        return search_results
+    
+    step, search_results, results, query_coverage = kept
+    return {
+        **search_results,
+        "results_fetched": len(results),
+        "max_results": max_results,
+        "escalations": step,
+        "coverage": query_coverage,
+    }
+
+
+COURT_KEYWORDS = {
+    "supreme_court": "Supreme Court of India",
+    "high_court": "High Court India",
+    "district_court": "District Court India",
+    "all": "Indian courts"
+}
+
+ACT_KEYWORDS = {
+    "central": "Central Act India Parliament",
+    "state": "State Act India Legislature",
+    "both": "Indian legislation Act"
+}
+
+
+def _legal_query(query: str, jurisdiction: str = "indian") -> str:
+    if jurisdiction == "indian":
+        return f"{query} Indian law India legal"
+    return query
+
+
+def _case_law_query(query: str, court_level: Optional[str] = "all") -> str:
+    return f"{query} {COURT_KEYWORDS.get(court_level, 'Indian courts')} case law judgment"
+
+
+def _statutory_query(query: str, act_type: Optional[str] = "both") -> str:
+    return f"{query} {ACT_KEYWORDS.get(act_type, 'Indian legislation')} statute provision"
 
 
 def legal_search(
@@ -24,19 +371,8 @@ def legal_search(
     max_results: int = 10,
     include_raw_content: bool = True,
 ):
-    """Search for legal information across various sources."""
-    enhanced_query = query
-    if jurisdiction == "indian":
-        enhanced_query = f"{query} Indian law India legal"
-    
-    search_results = tavily_client.search(
-        enhanced_query,
-        max_results=max_results,
-        include_raw_content=include_raw_content,
-        exclude_domains=["indiankanoon.org"],
-        topic="general",
-    )
-    return search_results
+    """Search for legal information across various sources. Fetches more results, up to max_results, only when needed."""
+    return _adaptive_search(query, _legal_query(query, jurisdiction), max_results, include_raw_content)
 
 
 def case_law_search(
@@ -44,24 +380,8 @@ def case_law_search(
     court_level: Optional[Literal["supreme_court", "high_court", "district_court", "all"]] = "all",
     max_results: int = 8,
 ):
-    """Search specifically for case law and judicial precedents."""
-    court_keywords = {
-        "supreme_court": "Supreme Court of India",
-        "high_court": "High Court India",
-        "district_court": "District Court India",
-        "all": "Indian courts"
-    }
-    
-    enhanced_query = f"{query} {court_keywords.get(court_level, 'Indian courts')} case law judgment"
-    
-    search_results = tavily_client.search(
-        enhanced_query,
-        max_results=max_results,
-        include_raw_content=True,
-        exclude_domains=["indiankanoon.org"],
-        topic="general",
-    )
-    return search_results
+    """Search specifically for case law and judicial precedents. Fetches more results, up to max_results, only when needed."""
+    return _adaptive_search(query, _case_law_query(query, court_level), max_results)
 
 
 def statutory_search(
@@ -69,26 +389,96 @@ def statutory_search(
     act_type: Optional[Literal["central", "state", "both"]] = "both",
     max_results: int = 8,
 ):
-    """Search for statutes, acts, and legislative provisions."""
-    act_keywords = {
-        "central": "Central Act India Parliament",
-        "state": "State Act India Legislature",
-        "both": "Indian legislation Act"
-    }
-    
-    enhanced_query = f"{query} {act_keywords.get(act_type, 'Indian legislation')} statute provision"
+    """Search for statutes, acts, and legislative provisions. Fetches more results, up to max_results, only when needed."""
+    return _adaptive_search(query, _statutory_query(query, act_type), max_results)
+
+
+def _prefetch_key(params: dict) -> str:
+    """
+    Key on which a tool call's search matches a prefetch: the query's
+    significant terms, so case, punctuation, word order and filler words an
+    agent adds or drops do not matter, together with the other search params.
+    """
+    return search_cache.make_key({**params, "query": " ".join(sorted(query_terms(params["query"])))})
+
+
+def start_search_prefetch(query: str) -> SearchPrefetcher:
+    """
+    Speculatively start the searches researchers are most likely to issue
+    first: the raw query through each search tool with its default
+    jurisdiction keywords and first escalation step. This overlaps search
+    latency with the query-analyzer round trip. In parallel orchestration
+    the results are also listed in the researchers' task.
+    """
+    prefetcher = SearchPrefetcher(_run_search, _prefetch_key)
+    for enhanced_query, max_results in (
+        (_legal_query(query), 10),
+        (_case_law_query(query), 8),
+        (_statutory_query(query), 8),
+    ):
+        prefetcher.prefetch(_search_params(enhanced_query, escalation_steps(max_results)[0]))
+    return prefetcher
+
+
+def read_source(source_id: str, offset: int = 0, length: int = 8000):
+    """Read stored full text of a search result or file by its source_id, from byte offset for length bytes."""
+    offset = max(0, int(offset))
+    length = max(0, int(length))
+    try:
+        size = blob_store.size(source_id)
+    except (OSError, ValueError):
+        return {"error": f"Unknown source_id: {source_id}"}
     
-    search_results = tavily_client.search(
-        enhanced_query,
-        max_results=max_results,
-        include_raw_content=True,
-        exclude_domains=["indiankanoon.org"],
-        topic="general",
-    )
-    return search_results
+    text = blob_store.read(source_id, offset, length)
+    return {
+        "source_id": source_id,
+        "offset": offset,
+        "size": size,
+        "text": text,
+        "has_more": offset + length < size,
+    }
+
+
+def _spill_files(files: dict) -> dict:
+    """Keep large files (inputs, and those the agent writes) out of memory, leaving a preview and a source_id in their place."""
+    spilled = {}
+    for filename, content in files.items():
+        stored = spill_text(content) if isinstance(content, str) else {"text": content}
+        if "source_id" in stored:
+            spilled[filename] = (
+                f"[Stored outside the conversation: source_id={stored['source_id']}, {stored['size']} bytes. "
+                f"Use read_source to read the full file.]\n\n{stored['preview']}"
+            )
+        else:
+            spilled[filename] = stored["text"]
+    return spilled
+
+
+# Prompt assembly: every system prompt starts with the same byte-identical
+# static prefix, followed by the role block and then any mode-specific delta.
+# Keeping variable content after the shared prefix lets provider-side prompt
+# prefix caching reuse it across modes, subagents and agent steps.
+shared_prompt_prefix = """You are part of a legal research system specialised in Indian law, courts, procedures, and statutory regimes.
+
+SHARED RESEARCH STANDARDS (apply to every role in this system):
+- Prefer primary, authoritative sources: judgments of the Supreme Court of India and High Courts, bare Acts, rules, regulations and official notifications.
+- Respect the hierarchy of courts: Supreme Court decisions bind all courts; High Court decisions bind subordinate courts within their territory and are persuasive elsewhere.
+- Distinguish binding from persuasive authority, note conflicting judgments, and check whether a precedent has been overruled or distinguished.
+- Check statutory provisions for amendments and their current status before relying on them.
+- Never fabricate cases, citations, sections or URLs; only rely on what the search tools return.
+- CRITICAL: capture the URL from the search results for every case, statute, provision or article you rely on.
+- Long page contents and files may be stored outside the conversation and shown only as a preview with a source_id; call read_source only when the preview and snippet are not enough.
+"""
+
+
+def build_prompt(*blocks: str) -> str:
+    """Assemble a system prompt from the shared prefix and role/mode blocks, in that order."""
+    return "\n".join([shared_prompt_prefix] + [block.strip("\n") + "\n" for block in blocks])
+
 
+query_analyzer_role = """ROLE: LEGAL QUERY ANALYZER
 
-query_analyzer_prompt = """You are a legal query analyzer. Your job is to understand the user's legal query and determine:
+You are a legal query analyzer. Your job is to understand the user's legal query and determine:
 
 1. Whether this is a legal query requiring deep research
 2. The complexity level: simple, moderate, or complex
@@ -117,16 +507,19 @@ Based on your analysis, provide a structured breakdown:
 Only use the search tools if you need clarification on legal terminology or concepts.
 Your analysis will guide whether to proceed with deep research or provide a direct response."""
 
+query_analyzer_prompt = build_prompt(query_analyzer_role)
+
 query_analyzer_subagent = {
     "name": "query-analyzer",
     "description": "Analyzes legal queries to understand their nature, jurisdiction, domain, and complexity.",
     "prompt": query_analyzer_prompt,
-    "tools": [legal_search],
-    "model": openai_model,
+    "tools": [legal_search, read_source],
 }
 
 
-case_law_researcher_prompt = """You are a case law research specialist. Your job is to find and analyze relevant judicial precedents.
+case_law_researcher_role = """ROLE: CASE LAW RESEARCH SPECIALIST
+
+You are a case law research specialist. Your job is to find and analyze relevant judicial precedents.
 
 When researching case law:
 1. Search for landmark judgments and binding precedents
@@ -137,20 +530,21 @@ When researching case law:
 
 Use the case_law_search tool extensively. 
 
-CRITICAL: For every case you find, capture the URL from the search results.
-
 Your findings will be compiled into the final legal research report, so be comprehensive and accurate."""
 
+case_law_researcher_prompt = build_prompt(case_law_researcher_role)
+
 case_law_researcher_subagent = {
     "name": "case-law-researcher",
     "description": "Specializes in finding and analyzing case law, judicial precedents, and court judgments.",
     "prompt": case_law_researcher_prompt,
-    "tools": [case_law_search, legal_search],
-    "model": openai_model,
+    "tools": [case_law_search, legal_search, read_source],
 }
 
 
-statutory_researcher_prompt = """You are a statutory interpretation specialist. Your job is to research legislation, acts, rules, and regulations.
+statutory_researcher_role = """ROLE: STATUTORY INTERPRETATION SPECIALIST
+
+You are a statutory interpretation specialist. Your job is to research legislation, acts, rules, and regulations.
 
 When researching statutes:
 1. Find the exact statutory provisions relevant to the query
@@ -161,20 +555,21 @@ When researching statutes:
 
 Use the statutory_search tool extensively.
 
-CRITICAL: For every statute or provision you find, capture the URL from the search results.
-
 Your findings will be used in the final report, so ensure accuracy in citing provisions."""
 
+statutory_researcher_prompt = build_prompt(statutory_researcher_role)
+
 statutory_researcher_subagent = {
     "name": "statutory-researcher",
     "description": "Specializes in researching statutes, acts, rules, regulations, and legislative provisions.",
     "prompt": statutory_researcher_prompt,
-    "tools": [statutory_search, legal_search],
-    "model": openai_model,
+    "tools": [statutory_search, legal_search, read_source],
 }
 
 
-comparative_analyst_prompt = """You are a comparative legal analyst. Your job is to compare legal positions across different jurisdictions or analyze conflicting precedents.
+comparative_analyst_role = """ROLE: COMPARATIVE LEGAL ANALYST
+
+You are a comparative legal analyst. Your job is to compare legal positions across different jurisdictions or analyze conflicting precedents.
 
 When doing comparative analysis:
 1. Research the legal position in different jurisdictions
@@ -185,60 +580,35 @@ When doing comparative analysis:
 
 Use all available search tools as needed.
 
-CRITICAL: Capture URLs for all sources you reference.
-
 Present your analysis in a structured, comparative format showing key differences and similarities."""
 
+comparative_analyst_prompt = build_prompt(comparative_analyst_role)
+
 comparative_analyst_subagent = {
     "name": "comparative-analyst",
     "description": "Specializes in comparative legal analysis across jurisdictions or conflicting precedents.",
     "prompt": comparative_analyst_prompt,
-    "tools": [legal_search, case_law_search, statutory_search],
-    "model": openai_model,
+    "tools": [legal_search, case_law_search, statutory_search, read_source],
 }
 
 
-legal_research_instructions_normal = """
+legal_research_role = """ROLE: LEAD LEGAL RESEARCH AGENT
+
 You are an expert Indian legal research agent with deep mastery of Indian law, courts, procedures, and statutory regimes.
 
 Your job: take a legal question, do rigorous research, and output ONLY a valid JSON response with structured content and references.
 
-WORKFLOW:
-
-1. QUERY ANALYSIS (MANDATORY FIRST STEP)  
-   - ALWAYS invoke the query-analyzer subagent first to classify the query.  
-   - Based on that, label the query as one of:
-     * legal-complex - requires full deep research  
-     * legal-simple - straightforward legal question  
-     * non-legal / off-topic - outside your domain  
-
-2. NON-LEGAL / OFF-TOPIC QUERIES  
-   - If the classification is non-legal or off-topic:  
-     Return JSON: {"error": "I am a specialized legal research agent focused on Indian law. This query seems outside that domain.", "suggestion": "Please ask legal questions related to Indian law."}
-
-3. SIMPLE LEGAL QUERIES  
-   - If classification is legal-simple:  
-     Provide a brief, direct answer with 1-2 citations in the JSON format below.
-
-4. DEEP RESEARCH FOR COMPLEX QUERIES  
-   - If classification is legal-complex:  
-     * Invoke relevant subagents as needed
-     * Combine their outputs with direct calls to search tools
-     * Identify key issues, doctrinal tensions, hierarchy of authorities
-     * Note binding vs persuasive sources, conflicting judgments
-     * Provide a CONCISE but COMPREHENSIVE response
-
-5. JSON OUTPUT FORMAT (MANDATORY)  
+JSON OUTPUT FORMAT (MANDATORY)  
    Your response MUST be ONLY valid JSON in this exact structure:
 
    {
      "content": [
        {
-         "text": "First paragraph or sentence of analysis",
+         "text": "First paragraph or section of analysis",
          "refs": ["ref1", "ref2"]
        },
        {
-         "text": "Next paragraph or sentence",
+         "text": "Next paragraph or section",
          "refs": ["ref3"]
        }
      ],
@@ -266,17 +636,9 @@ CRITICAL RULES:
 - All references must be defined in the references object
 - Types can be: "case", "statute", "article", "regulation", "report"
 - Include URLs whenever available from search results
-- Break content into logical paragraphs or sections
-- Ensure JSON is properly escaped and valid
-- Be CONCISE and FOCUSED - provide optimal depth without unnecessary verbosity
-"""
+- Ensure JSON is properly escaped and valid"""
 
-legal_research_instructions_detailed = """
-You are an expert Indian legal research agent with deep mastery of Indian law, courts, procedures, and statutory regimes.
-
-Your job: take a legal question, do rigorous research, and output ONLY a valid JSON response with EXTREMELY DETAILED structured content and references.
-
-WORKFLOW:
+legal_research_workflow_agent = """WORKFLOW:
 
 1. QUERY ANALYSIS (MANDATORY FIRST STEP)  
    - ALWAYS invoke the query-analyzer subagent first to classify the query.  
@@ -285,91 +647,527 @@ WORKFLOW:
      * legal-simple - straightforward legal question  
      * non-legal / off-topic - outside your domain  
 
+   - FOLLOW-UP QUESTIONS: if the conversation already contains earlier research, first check whether
+     the earlier answers, the files under session/ (sources already retrieved and their references)
+     answer the question. Search only for what is missing and reuse existing reference ids where the
+     same source is cited. The query-analyzer step may be skipped for such follow-ups.
+
 2. NON-LEGAL / OFF-TOPIC QUERIES  
    - If the classification is non-legal or off-topic:  
      Return JSON: {"error": "I am a specialized legal research agent focused on Indian law. This query seems outside that domain.", "suggestion": "Please ask legal questions related to Indian law."}
 
 3. SIMPLE LEGAL QUERIES  
-   - If classification is legal-simple:  
-     Still provide DETAILED analysis with multiple citations.
+   - If classification is legal-simple: follow the instructions in the MODE section below.
 
 4. DEEP RESEARCH FOR COMPLEX QUERIES  
    - If classification is legal-complex:  
-     * Invoke ALL relevant subagents extensively
-     * Make MULTIPLE calls to search tools to gather comprehensive information
-     * Provide EXHAUSTIVE statutory analysis with clause-by-clause breakdown
-     * Include ALL relevant case law with detailed facts, holdings, and reasoning
-     * Discuss historical legislative context and evolution
-     * Analyze multiple jurisdictional perspectives where applicable
-     * Detail procedural requirements extensively
-     * Provide comprehensive practical implications and risk analysis
-     * Discuss policy considerations and potential reforms
-     * Include multiple hypothetical scenarios and examples
-     * MAXIMIZE depth, breadth, and comprehensiveness of analysis
-
-5. JSON OUTPUT FORMAT (MANDATORY)  
-   Your response MUST be ONLY valid JSON in this exact structure with EXTENSIVE content:
+     * Invoke relevant subagents and combine their outputs with direct calls to search tools
+     * Identify key issues, doctrinal tensions, hierarchy of authorities
+     * Note binding vs persuasive sources, conflicting judgments
+     * Follow the instructions in the MODE section below for depth and length
 
-   {
-     "content": [
-       {
-         "text": "Detailed first section of analysis with comprehensive explanation",
-         "refs": ["ref1", "ref2", "ref3"]
-       },
-       {
-         "text": "Detailed next section with thorough examination",
-         "refs": ["ref4", "ref5"]
-       }
-     ],
-     "references": {
-       "ref1": {
-         "title": "Title or case name",
-         "url": "https://example.com",
-         "authors": "Author or bench",
-         "year": 2023,
-         "type": "case"
-       }
-     }
-   }
+5. Answer in the JSON OUTPUT FORMAT above."""
 
-CRITICAL RULES:
-- Output ONLY valid JSON, no other text before or after
-- Each text segment should reference relevant sources via refs array
-- All references must be defined in the references object
-- Types can be: "case", "statute", "article", "regulation", "report"
-- Include URLs whenever available from search results
-- Break content into MANY logical paragraphs or sections
-- Ensure JSON is properly escaped and valid
-- MAXIMIZE detail - generate the LONGEST, most COMPREHENSIVE response possible
-- Include EXTENSIVE case law analysis
-- Provide DETAILED statutory interpretation
-- Cover ALL possible angles and perspectives
-- Generate AT LEAST 10-20 content sections for complex queries
-"""
+legal_research_workflow_parallel = """WORKFLOW:
+
+The query-analyzer and, for legal-complex queries, the researcher subagents have already run before
+your turn. Their results arrive in the last user message: a QUERY ANALYSIS and, for legal-complex
+queries, the findings of each researcher. Your work starts at synthesis.
+
+1. QUERY ANALYSIS (ALREADY DONE)  
+   - Do not invoke the query-analyzer subagent; take the classification from the QUERY ANALYSIS:
+     * legal-complex - requires full deep research  
+     * legal-simple - straightforward legal question  
+     * non-legal / off-topic - outside your domain  
+
+2. NON-LEGAL / OFF-TOPIC QUERIES  
+   - If the classification is non-legal or off-topic:  
+     Return JSON: {"error": "I am a specialized legal research agent focused on Indian law. This query seems outside that domain.", "suggestion": "Please ask legal questions related to Indian law."}
+
+3. SIMPLE LEGAL QUERIES  
+   - If classification is legal-simple: research with the search tools and follow the instructions
+     in the MODE section below.
+
+4. SYNTHESIS FOR COMPLEX QUERIES  
+   - If classification is legal-complex:  
+     * Synthesise the researchers' findings, keeping the source URL of every authority they cite
+     * Call researcher subagents or search tools again only to fill a clear gap, e.g. an area
+       whose researcher timed out or failed
+     * Identify key issues, doctrinal tensions, hierarchy of authorities
+     * Note binding vs persuasive sources, conflicting judgments
+     * Follow the instructions in the MODE section below for depth and length
+
+5. Answer in the JSON OUTPUT FORMAT above."""
+
+legal_research_mode_normal = """MODE: NORMAL
+- Simple legal queries: provide a brief, direct answer with 1-2 citations in the JSON format above.
+- Complex legal queries: invoke relevant subagents as needed and provide a CONCISE but COMPREHENSIVE response.
+- Break content into logical paragraphs or sections.
+- Be CONCISE and FOCUSED - provide optimal depth without unnecessary verbosity."""
 
+legal_research_mode_detailed = """MODE: DETAILED
+Output EXTREMELY DETAILED structured content and references.
+- Simple legal queries: still provide DETAILED analysis with multiple citations.
+- Complex legal queries:
+  * Invoke ALL relevant subagents extensively, or use ALL of their findings where they already ran
+  * Make MULTIPLE calls to search tools to gather comprehensive information
+  * Provide EXHAUSTIVE statutory analysis with clause-by-clause breakdown
+  * Include ALL relevant case law with detailed facts, holdings, and reasoning
+  * Discuss historical legislative context and evolution
+  * Analyze multiple jurisdictional perspectives where applicable
+  * Detail procedural requirements extensively
+  * Provide comprehensive practical implications and risk analysis
+  * Discuss policy considerations and potential reforms
+  * Include multiple hypothetical scenarios and examples
+  * MAXIMIZE depth, breadth, and comprehensiveness of analysis
+- Break content into MANY logical paragraphs or sections.
+- MAXIMIZE detail - generate the LONGEST, most COMPREHENSIVE response possible.
+- Include EXTENSIVE case law analysis and DETAILED statutory interpretation.
+- Cover ALL possible angles and perspectives.
+- Generate AT LEAST 10-20 content sections for complex queries."""
 
-def create_agent_for_mode(mode: Literal["normal", "detailed"]):
-    """Create agent with appropriate instructions based on mode."""
-    instructions = legal_research_instructions_detailed if mode == "detailed" else legal_research_instructions_normal
+legal_research_instructions_normal = build_prompt(legal_research_role, legal_research_workflow_agent, legal_research_mode_normal)
+
+legal_research_instructions_detailed = build_prompt(legal_research_role, legal_research_workflow_agent, legal_research_mode_detailed)
+
+# For runs whose query analyzer and researchers already ran in the parallel phase.
+legal_research_instructions_parallel_normal = build_prompt(legal_research_role, legal_research_workflow_parallel, legal_research_mode_normal)
+
+legal_research_instructions_parallel_detailed = build_prompt(legal_research_role, legal_research_workflow_parallel, legal_research_mode_detailed)
+
+
+json_fix_prompt = """You repair malformed JSON produced by a legal research agent.
+
+Return ONLY the corrected JSON object, with no other text or code fences. Keep every piece of
+content and every reference; do not add, summarise or rewrite text. The JSON must have the shape
+{"content": [{"text": "...", "refs": ["ref1"]}], "references": {"ref1": {"title": "...", "url": "...", "authors": "...", "year": 2023, "type": "case"}}}
+and every id in a "refs" array must be defined in "references"."""
+
+
+def finalize_research_output(raw: str, verbose: bool = False) -> str:
+    """
+    Return the agent's final message as valid JSON.
+    
+    Malformed output is first repaired locally (extraction from prose or code
+    fences, syntax fixes, schema and reference checks). Only if that fails is a
+    single targeted LLM call made to fix the JSON. If that fails too, citations
+    missing from references are dropped as a last resort, and otherwise the raw
+    text is returned so the caller can still report it.
+    """
+    data, errors = parse_research_response(raw)
+    if data is not None:
+        return json.dumps(data, ensure_ascii=False)
+    
+    if verbose:
+        print(f"[JSON REPAIR] Local repair failed: {'; '.join(errors[:5])}")
+    
+    try:
+        fixed = get_json_fix_model().invoke([
+            {"role": "system", "content": json_fix_prompt},
+            {"role": "user", "content": "Problems found:\n- " + "\n- ".join(errors) + "\n\nJSON to fix:\n" + raw},
+        ])
+    except Exception as e:
+        if verbose:
+            print(f"[JSON REPAIR] LLM fix failed: {e}")
+        return _without_dangling_refs(raw, verbose)
+    
+    data, errors = parse_research_response(fixed.content)
+    if data is None:
+        if verbose:
+            print(f"[JSON REPAIR] LLM fix still invalid: {'; '.join(errors[:5])}")
+        return _without_dangling_refs(raw, verbose)
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _without_dangling_refs(raw: str, verbose: bool = False) -> str:
+    """The locally parsed answer with refs missing from references dropped, if that makes it valid; else raw."""
+    data, _ = load_research_json(raw)
+    if not isinstance(data, dict):
+        return raw
+    removed = prune_dangling_refs(data)
+    if not removed or validate_research_response(data):
+        return raw
+    if verbose:
+        print(f"[JSON REPAIR] Dropped {removed} citation(s) not defined in references")
+    return json.dumps(data, ensure_ascii=False)
+
+
+@lru_cache(maxsize=None)
+def _prompt_cache_stats_class():
+    with timed("import:langchain_core"):
+        from langchain_core.callbacks import BaseCallbackHandler
+    
+    class PromptCacheStats(BaseCallbackHandler):
+        """Accumulates token usage, including provider prompt-cache hits, over one run."""
+        
+        def __init__(self):
+            self.llm_calls = 0
+            self.input_tokens = 0
+            self.cached_input_tokens = 0
+            self.output_tokens = 0
+        
+        def on_llm_end(self, response, **kwargs):
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if not usage:
+                        continue
+                    self.llm_calls += 1
+                    self.input_tokens += usage.get("input_tokens", 0)
+                    self.output_tokens += usage.get("output_tokens", 0)
+                    self.cached_input_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0)
+        
+        def summary(self) -> dict:
+            return {
+                "llm_calls": self.llm_calls,
+                "input_tokens": self.input_tokens,
+                "cached_input_tokens": self.cached_input_tokens,
+                "output_tokens": self.output_tokens,
+                "cache_hit_ratio": round(self.cached_input_tokens / self.input_tokens, 3) if self.input_tokens else 0.0,
+            }
+    
+    return PromptCacheStats
+
+
+def new_usage_stats():
+    """A fresh PromptCacheStats callback for one run."""
+    return _prompt_cache_stats_class()()
+
+
+_agents = {}
+_agents_lock = threading.Lock()
+
+
+def create_agent_for_mode(mode: Literal["normal", "detailed"], orchestration: Literal["agent", "parallel"] = "agent"):
+    """
+    Create agent with appropriate instructions based on mode (built once per
+    mode, orchestration and process). The "parallel" variant is for runs whose
+    query analyzer and researchers already ran; its workflow starts at synthesis.
+    """
+    mode = "detailed" if mode == "detailed" else "normal"
+    orchestration = "parallel" if orchestration == "parallel" else "agent"
+    key = (mode, orchestration)
+    with _agents_lock:
+        if key not in _agents:
+            name = f"agent_{mode}" if orchestration == "agent" else f"agent_{mode}_parallel"
+            with timed(f"init:{name}"):
+                _agents[key] = _build_agent(mode, orchestration)
+        return _agents[key]
+
+
+def _build_agent(mode: str, orchestration: str = "agent"):
+    with timed("import:deepagents"):
+        from deepagents import create_deep_agent
+    
+    if orchestration == "parallel":
+        instructions = legal_research_instructions_parallel_detailed if mode == "detailed" else legal_research_instructions_parallel_normal
+    else:
+        instructions = legal_research_instructions_detailed if mode == "detailed" else legal_research_instructions_normal
+    model = get_openai_model()
     
     return create_deep_agent(
-        tools=[legal_search, case_law_search, statutory_search],
+        tools=[legal_search, case_law_search, statutory_search, read_source],
         instructions=instructions,
-        model=openai_model,
+        model=model,
         subagents=[
-            query_analyzer_subagent,
-            case_law_researcher_subagent,
-            statutory_researcher_subagent,
-            comparative_analyst_subagent,
+            {**subagent, "model": model}
+            for subagent in (
+                query_analyzer_subagent,
+                case_law_researcher_subagent,
+                statutory_researcher_subagent,
+                comparative_analyst_subagent,
+            )
         ],
     ).with_config({"recursion_limit": 50 if mode == "detailed" else 30})
 
 
+# "agent" lets the main agent call researcher subagents one after another;
+# "parallel" runs the query analyzer, then the selected researchers concurrently,
+# and hands their merged findings to the main agent for synthesis.
+RESEARCH_ORCHESTRATION = os.getenv("RESEARCH_ORCHESTRATION", "agent")
+
+SUBAGENT_TIMEOUTS = {
+    "query-analyzer": float(os.getenv("QUERY_ANALYZER_TIMEOUT", "60")),
+    "case-law-researcher": float(os.getenv("RESEARCHER_TIMEOUT", "180")),
+    "statutory-researcher": float(os.getenv("RESEARCHER_TIMEOUT", "180")),
+    "comparative-analyst": float(os.getenv("RESEARCHER_TIMEOUT", "180")),
+}
+
+_subagent_graphs = {}
+_subagent_graphs_lock = threading.Lock()
+
+
+class SubagentCancelled(Exception):
+    """Raised inside a subagent that was abandoned after its timeout."""
+
+
+# Set for each subagent of the parallel phase; the search tools and model calls
+# of an abandoned subagent stop once the event is set.
+current_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("current_cancel_event", default=None)
+
+
+def _raise_if_cancelled():
+    event = current_cancel_event.get()
+    if event is not None and event.is_set():
+        raise SubagentCancelled()
+
+
+@lru_cache(maxsize=None)
+def _cancellation_callback_class():
+    with timed("import:langchain_core"):
+        from langchain_core.callbacks import BaseCallbackHandler
+    
+    class CancellationCallback(BaseCallbackHandler):
+        """Stops an abandoned subagent at its next model or tool call."""
+        
+        raise_error = True
+        
+        def __init__(self, event: threading.Event):
+            self.event = event
+        
+        def _check(self):
+            if self.event.is_set():
+                raise SubagentCancelled()
+        
+        def on_chat_model_start(self, *args, **kwargs):
+            self._check()
+        
+        def on_llm_start(self, *args, **kwargs):
+            self._check()
+        
+        def on_tool_start(self, *args, **kwargs):
+            self._check()
+    
+    return CancellationCallback
+
+
+def _subagent_graph(subagent: dict):
+    """Standalone agent graph for a subagent definition, built once per process."""
+    with _subagent_graphs_lock:
+        if subagent["name"] not in _subagent_graphs:
+            with timed("import:langgraph"):
+                from langgraph.prebuilt import create_react_agent
+            with timed(f"init:subagent_{subagent['name']}"):
+                _subagent_graphs[subagent["name"]] = create_react_agent(
+                    subagent.get("model") or get_openai_model(),
+                    tools=subagent["tools"],
+                    prompt=subagent["prompt"],
+                )
+        return _subagent_graphs[subagent["name"]]
+
+
+def _invoke_subagent(subagent: dict, task: str, callbacks: list, cancelled: Optional[threading.Event] = None) -> str:
+    if cancelled is not None:
+        current_cancel_event.set(cancelled)
+        callbacks = callbacks + [_cancellation_callback_class()(cancelled)]
+    result = _subagent_graph(subagent).invoke(
+        {"messages": [{"role": "user", "content": task}]},
+        config={"callbacks": callbacks, "recursion_limit": 25},
+    )
+    return _final_message_content({"agent": result}) or ""
+
+
+def _run_subagents(jobs: list, callbacks: list) -> dict:
+    """
+    Run (subagent, task) pairs concurrently and wait for each up to its
+    SUBAGENT_TIMEOUTS entry. Each runs in a copy of this context so run-scoped
+    state (memory accounting, retrieved documents, prefetches) is shared.
+    Subagents still running at their deadline are abandoned and cancelled:
+    their next search, tool or model call raises SubagentCancelled.
+    Returns {name: {"status", "output", "seconds"}}.
+    """
+    started = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="subagent")
+    running = {}
+    for subagent, task in jobs:
+        cancelled = threading.Event()
+        future = executor.submit(copy_context().run, _invoke_subagent, subagent, task, callbacks, cancelled)
+        running[subagent["name"]] = (future, cancelled)
+    
+    outcomes = {}
+    for name, (future, cancelled) in running.items():
+        remaining = SUBAGENT_TIMEOUTS.get(name, 180) - (time.monotonic() - started)
+        try:
+            outcomes[name] = {"status": "completed", "output": future.result(timeout=max(remaining, 0))}
+        except FutureTimeoutError:
+            cancelled.set()
+            outcomes[name] = {"status": "timeout", "output": None}
+        except Exception as e:
+            outcomes[name] = {"status": "failed", "output": str(e)}
+        outcomes[name]["seconds"] = round(time.monotonic() - started, 2)
+    executor.shutdown(wait=False, cancel_futures=True)
+    return outcomes
+
+
+def _analysis_field(analysis: str, label: str) -> str:
+    """
+    Lower-cased value of a "Label: value" line of the analyzer's output,
+    tolerating markdown emphasis and brackets (e.g. "- **Query Relevance:** [legal-complex]").
+    """
+    match = re.search(re.escape(label) + r"[\s*_]*:[ \t*_\[]*([^\n]*)", analysis, re.IGNORECASE)
+    return match.group(1).strip(" \t*_[]").lower() if match else ""
+
+
+def _select_researchers(analysis: str) -> list:
+    """Researcher subagents for a legal-complex query, based on the analyzer's breakdown."""
+    researchers = [case_law_researcher_subagent, statutory_researcher_subagent]
+    if (
+        "comparative" in _analysis_field(analysis, "Query Type")
+        or "international" in _analysis_field(analysis, "Jurisdiction")
+    ):
+        researchers.append(comparative_analyst_subagent)
+    return researchers
+
+
+def _prefetched_sources() -> str:
+    """The run's prefetched search results, claimed and listed for the researchers' task."""
+    prefetcher = current_prefetcher.get()
+    if prefetcher is None:
+        return ""
+    run_documents = current_run_documents.get()
+    seen = set()
+    lines = []
+    for search_results in prefetcher.take_all():
+        if search_results.get("search_unavailable"):
+            continue
+        search_results = _spill_raw_content(search_results)
+        results = search_results.get("results", [])
+        if run_documents is not None:
+            run_documents.add(results)
+        for result in results:
+            url = result.get("url")
+            if not url or url in seen:
+                continue
+            seen.add(url)
+            line = f"- {result.get('title') or url} ({url})"
+            if result.get("raw_content_source_id"):
+                line += f" [source_id: {result['raw_content_source_id']}]"
+            snippet = " ".join((result.get("content") or "").split())[:300]
+            lines.append(f"{line}\n  {snippet}" if snippet else line)
+    return "\n".join(lines)
+
+
+def _parallel_research_phase(
+    query: str,
+    callbacks: list,
+    on_event: Optional[Callable[[dict], None]] = None,
+    verbose: bool = False,
+) -> Optional[str]:
+    """
+    Run the query analyzer and, for legal-complex queries, the selected
+    researcher subagents concurrently with per-subagent timeouts. Returns a
+    briefing for the main agent holding the analysis and merged findings, or
+    None when the analyzer did not finish (the main agent then runs it itself).
+    """
+    started = time.monotonic()
+    analyzer = _run_subagents([(query_analyzer_subagent, query)], callbacks)["query-analyzer"]
+    if analyzer["status"] != "completed":
+        if on_event:
+            on_event({
+                "type": "research_phase",
+                "subagents": {"query-analyzer": {"status": analyzer["status"], "seconds": analyzer["seconds"]}},
+                "seconds": round(time.monotonic() - started, 2),
+            })
+        if verbose:
+            print(f"[PARALLEL RESEARCH] query-analyzer {analyzer['status']}; continuing sequentially\n")
+        return None
+    
+    analysis = analyzer["output"] or ""
+    relevance = re.match(r"[a-z-]+", _analysis_field(analysis, "Query Relevance"))
+    relevance = relevance.group(0) if relevance else "unknown"
+    
+    briefing = [
+        "The query-analyzer subagent has already been run for this query; do not invoke it again.",
+        "",
+        "QUERY ANALYSIS:",
+        analysis,
+    ]
+    if relevance != "legal-complex":
+        return "\n".join(briefing)
+    
+    researchers = _select_researchers(analysis)
+    if on_event:
+        on_event({"type": "status", "content": "Researching in parallel: " + ", ".join(r["name"] for r in researchers)})
+    if verbose:
+        print(f"[PARALLEL RESEARCH] {', '.join(r['name'] for r in researchers)}\n")
+    
+    task = f"{query}\n\nQuery analysis:\n{analysis}\n\n"
+    prefetched = _prefetched_sources()
+    if prefetched:
+        task += (
+            "Search results already retrieved for this query (start from these; search only for what they do not cover):\n"
+            f"{prefetched}\n\n"
+        )
+    task += "Research this query within your specialty and report your findings with the source URL for every authority."
+    outcomes = _run_subagents([(researcher, task) for researcher in researchers], callbacks)
+    
+    findings = []
+    for name, outcome in outcomes.items():
+        if outcome["status"] == "completed":
+            findings.append(f"### Findings from {name}\n{outcome['output']}")
+        elif outcome["status"] == "timeout":
+            findings.append(f"### Findings from {name}\n(Timed out; research this area directly if it matters.)")
+        else:
+            findings.append(f"### Findings from {name}\n(Failed: {outcome['output']}; research this area directly if it matters.)")
+    
+    if on_event:
+        on_event({
+            "type": "research_phase",
+            "subagents": {
+                "query-analyzer": {"status": "completed", "seconds": analyzer["seconds"]},
+                **{name: {"status": o["status"], "seconds": o["seconds"]} for name, o in outcomes.items()},
+            },
+            "seconds": round(time.monotonic() - started, 2),
+        })
+    
+    briefing += [
+        "",
+        "The research phase is complete: the researcher subagents below ran in parallel. Synthesise their",
+        "findings into the final JSON answer. Only call subagents or search tools again to fill a clear gap.",
+        "",
+        "\n\n".join(findings),
+    ]
+    return "\n".join(briefing)
+
+
+def _final_message_content(final_result) -> Optional[str]:
+    """Content of the last message in the agent's final state update."""
+    if not final_result:
+        return None
+    if isinstance(final_result, dict):
+        for node_data in final_result.values():
+            if isinstance(node_data, dict) and "messages" in node_data:
+                messages = node_data["messages"]
+                last_message = messages[-1] if isinstance(messages, list) else messages
+                
+                if hasattr(last_message, "content"):
+                    return last_message.content
+                elif isinstance(last_message, dict) and "content" in last_message:
+                    return last_message["content"]
+    elif hasattr(final_result, "content"):
+        return final_result.content
+    return None
+
+
+def _node_updates(chunk):
+    """
+    Node updates of a stream chunk. With a list of stream modes, chunks arrive
+    as (mode, updates) tuples rather than bare update dicts; both must reach
+    the node_completed events and the agent file collection.
+    """
+    if isinstance(chunk, tuple) and len(chunk) == 2 and isinstance(chunk[1], dict):
+        return chunk[1]
+    return chunk
+
+
 def research_legal_query(
     query: str, 
     files: Optional[dict] = None, 
     verbose: bool = True,
-    mode: Literal["normal", "detailed"] = "normal"
+    mode: Literal["normal", "detailed"] = "normal",
+    on_event: Optional[Callable[[dict], None]] = None,
+    session_id: Optional[str] = None,
+    orchestration: Optional[Literal["agent", "parallel"]] = None,
 ):
     """
     Research a legal query and return JSON response.
@@ -379,18 +1177,40 @@ def research_legal_query(
         files: Optional dictionary of files to provide as context
         verbose: Whether to show detailed streaming output
         mode: "normal" for optimal response, "detailed" for maximum comprehensive response
+        on_event: Optional callback receiving progress events (e.g. node completions)
+        session_id: Optional conversation session; earlier turns, retrieved documents,
+            references and agent files of the session are reused for follow-up questions
+        orchestration: "agent" (subagents called by the main agent) or "parallel" (analyzer,
+            then researchers run concurrently before synthesis); defaults to RESEARCH_ORCHESTRATION
     
     Returns:
         JSON string with structured legal research
     """
-    agent = create_agent_for_mode(mode)
+    run_memory = RunMemory()
+    run_memory_token = current_run_memory.set(run_memory)
+    
+    session = (session_store.get(session_id) if session_id else None) or new_session()
+    is_followup = bool(session["turns"])
+    run_documents = RunDocuments()
+    run_documents_token = current_run_documents.set(run_documents)
+    agent_files = {}
+    
+    # Follow-ups are usually poor standalone search queries, so they are not prefetched.
+    prefetcher = start_search_prefetch(query) if SEARCH_PREFETCH and not is_followup else None
+    prefetcher_token = current_prefetcher.set(prefetcher)
+    
+    parallel = (orchestration or RESEARCH_ORCHESTRATION) == "parallel" and not is_followup
+    
+    # Built after the prefetch starts so that a cold first request overlaps the two.
+    # A parallel run picks its agent once it knows whether the parallel phase finished.
+    agent = None if parallel else create_agent_for_mode(mode)
     
     input_state = {
-        "messages": [{"role": "user", "content": query}]
+        "messages": followup_messages(session) + [{"role": "user", "content": query}]
     }
     
-    if files:
-        input_state["files"] = files
+    if files or is_followup:
+        input_state["files"] = {**session_files(session), **_spill_files(files or {})}
     
     if verbose:
         print("\n" + "=" * 80)
@@ -400,11 +1220,31 @@ def research_legal_query(
         print("-" * 80 + "\n")
     
     final_result = None
+    usage_stats = new_usage_stats()
     
     try:
-        for chunk in agent.stream(input_state, stream_mode=["updates"]):
+        if parallel:
+            briefing = _parallel_research_phase(query, [usage_stats], on_event, verbose)
+            if briefing:
+                input_state["messages"].append({"role": "user", "content": briefing})
+            # Without a briefing the standard agent runs the analyzer and researchers itself.
+            agent = create_agent_for_mode(mode, "parallel" if briefing else "agent")
+        
+        for chunk in agent.stream(input_state, stream_mode=["updates"], config={"callbacks": [usage_stats]}):
+            chunk = _node_updates(chunk)
+            
             if isinstance(chunk, dict):
                 for node_name, node_data in chunk.items():
+                    if node_data and isinstance(node_data, dict) and isinstance(node_data.get("files"), dict):
+                        # Spilled as they arrive, under the same per-run budget as search content.
+                        agent_files.update(_spill_files(node_data["files"]))
+                    
+                    if on_event:
+                        event = {"type": "node_completed", "node": node_name}
+                        if node_data and isinstance(node_data, dict) and "files" in node_data:
+                            event["files"] = list(node_data["files"].keys())
+                        on_event(event)
+                    
                     if verbose:
                         print(f"[NODE COMPLETED] {node_name}")
                         
@@ -429,22 +1269,40 @@ def research_legal_query(
             print("=" * 80)
             print("RESEARCH COMPLETE".center(80))
             print("=" * 80 + "\n")
+            usage = usage_stats.summary()
+            print(f"[USAGE] {usage['llm_calls']} LLM calls, {usage['input_tokens']} input tokens "
+                  f"({usage['cached_input_tokens']} cached, {usage['cache_hit_ratio']:.0%}), "
+                  f"{usage['output_tokens']} output tokens\n")
         
-        if final_result:
-            if isinstance(final_result, dict):
-                for node_data in final_result.values():
-                    if isinstance(node_data, dict) and "messages" in node_data:
-                        messages = node_data["messages"]
-                        last_message = messages[-1] if isinstance(messages, list) else messages
-                        
-                        if hasattr(last_message, "content"):
-                            return last_message.content
-                        elif isinstance(last_message, dict) and "content" in last_message:
-                            return last_message["content"]
-            elif hasattr(final_result, "content"):
-                return final_result.content
+        if verbose:
+            memory = run_memory.summary()
+            print(f"[MEMORY] {memory['inline_bytes']} bytes inline, {memory['spilled_bytes']} bytes spilled "
+                  f"to {memory['blobs']} blob(s), process peak RSS {memory['process_peak_rss_mb']} MB\n")
+        
+        if prefetcher is not None:
+            prefetcher.close()
+            if verbose:
+                stats = prefetcher.summary()
+                print(f"[PREFETCH] {stats['hits']}/{stats['prefetched']} prefetched searches used "
+                      f"({stats['hit_rate']:.0%}), {stats['cancelled']} cancelled\n")
+        
+        if on_event:
+            on_event({"type": "usage", **usage_stats.summary()})
+            on_event({"type": "memory", **run_memory.summary()})
+            if prefetcher is not None:
+                on_event({"type": "prefetch", **prefetcher.summary()})
+        
+        content = _final_message_content(final_result)
+        if content is None:
+            return json.dumps({"error": "No response generated"})
         
-        return json.dumps({"error": "No response generated"})
+        output = finalize_research_output(content, verbose)
+        if session_id:
+            session_store.save(
+                session_id,
+                update_session(session, query, output, run_documents.documents, agent_files),
+            )
+        return output
         
     except Exception as e:
         if verbose:
@@ -455,6 +1313,35 @@ def research_legal_query(
             "error": "Research failed",
             "details": str(e)
         })
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+        current_prefetcher.reset(prefetcher_token)
+        current_run_documents.reset(run_documents_token)
+        current_run_memory.reset(run_memory_token)
+
+
+def warm_up(orchestration: Optional[str] = None) -> dict:
+    """
+    Import the agent dependencies and build the API clients, models and agent
+    graphs ahead of the first request. Returns the recorded startup timings.
+    """
+    get_tavily_client()
+    get_json_fix_model()
+    new_usage_stats()
+    for mode in ("normal", "detailed"):
+        create_agent_for_mode(mode)
+    if (orchestration or RESEARCH_ORCHESTRATION) == "parallel":
+        for mode in ("normal", "detailed"):
+            create_agent_for_mode(mode, "parallel")
+        for subagent in (
+            query_analyzer_subagent,
+            case_law_researcher_subagent,
+            statutory_researcher_subagent,
+            comparative_analyst_subagent,
+        ):
+            _subagent_graph(subagent)
+    return startup_timings()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+import re
+import json
+from typing import List, Optional, Tuple
+
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _next_significant_index(text: str, index: int) -> int:
+    """Index of the next non-whitespace character at or after index (len(text) at end)."""
+    while index < len(text) and text[index].isspace():
+        index += 1
+    return index
+
+
+def _next_significant(text: str, index: int) -> str:
+    """Return the next non-whitespace character at or after index ("" at end)."""
+    index = _next_significant_index(text, index)
+    return text[index] if index < len(text) else ""
+
+
+def _starts_value(text: str, index: int) -> bool:
+    """Whether a JSON key or value (or the end of a container) can start at index."""
+    char = _next_significant(text, index)
+    if char == "" or char in '"{[]}-' or char.isdigit():
+        return True
+    return text.startswith(("true", "false", "null"), _next_significant_index(text, index))
+
+
+def _closes_string(text: str, index: int) -> bool:
+    """
+    Whether the quote at index ends the current string, judged by what follows:
+    a closer or the end of the text, or a comma/colon followed by something
+    that can start JSON. Prose such as 'The "Act", as amended' stays inside.
+    """
+    following = _next_significant_index(text, index + 1)
+    char = text[following] if following < len(text) else ""
+    if char in ("", "}", "]"):
+        return True
+    if char in (",", ":"):
+        return _starts_value(text, following + 1)
+    return False
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """
+    Pull the outermost JSON object out of surrounding prose or code fences.
+
+    If the object is never closed (truncated output), everything from the
+    opening brace onwards is returned so repair_json can close it.
+    """
+    fenced = _FENCE_RE.search(text)
+    if fenced and "{" in fenced.group(1):
+        text = fenced.group(1)
+
+    start = text.find("{")
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def repair_json(text: str) -> str:
+    """
+    Fix common defects in LLM-produced JSON.
+
+    Handles trailing commas, unescaped quotes and control characters inside
+    strings, and truncated output (unterminated strings, arrays and objects).
+    When the text is truncated mid-value, the partial trailing element is
+    dropped rather than completed, so cut-off strings such as a half-written
+    URL never come back as values. Returns the best candidate; it is not
+    guaranteed to parse.
+    """
+    out = []
+    stack = []
+    # Points where everything emitted so far is a sequence of complete values.
+    safe_points = []
+    in_string = False
+    i = 0
+
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if char == "\\" and i + 1 < len(text):
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            if char == '"':
+                if _closes_string(text, i):
+                    in_string = False
+                    out.append(char)
+                else:
+                    out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            elif char == "\r":
+                out.append("\\r")
+            elif char == "\t":
+                out.append("\\t")
+            else:
+                out.append(char)
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char == ",":
+            if _next_significant(text, i + 1) in ("}", "]"):
+                pass
+            else:
+                safe_points.append((len(out), list(stack)))
+                out.append(char)
+        elif char in "{[":
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            if stack and _CLOSERS[stack[-1]] == char:
+                stack.pop()
+                out.append(char)
+                safe_points.append((len(out), list(stack)))
+        else:
+            out.append(char)
+        i += 1
+
+    if not in_string and not stack:
+        return "".join(out)
+
+    # Truncated: closing as-is is only safe right after a complete string or
+    # container (a cut-off number or literal cannot be told apart from a whole
+    # one); otherwise fall back to the last complete element.
+    candidates = [(out[:position], snapshot) for position, snapshot in reversed(safe_points)]
+    if not in_string and "".join(out).rstrip()[-1:] in ('"', "}", "]"):
+        candidates.insert(0, (out, stack))
+    for prefix, open_brackets in candidates:
+        body = "".join(prefix).rstrip().rstrip(",")
+        candidate = body + "".join(_CLOSERS[b] for b in reversed(open_brackets))
+        try:
+            json.loads(candidate)
+            return candidate
+        except json.JSONDecodeError:
+            continue
+    return "".join(out)
+
+
+def prune_dangling_refs(data: dict) -> int:
+    """Remove refs that are not strings defined in references; returns how many were removed."""
+    references = data.get("references")
+    content = data.get("content")
+    if not isinstance(references, dict) or not isinstance(content, list):
+        return 0
+
+    removed = 0
+    for segment in content:
+        if isinstance(segment, dict) and isinstance(segment.get("refs"), list):
+            kept = [ref for ref in segment["refs"] if isinstance(ref, str) and ref in references]
+            removed += len(segment["refs"]) - len(kept)
+            segment["refs"] = kept
+    return removed
+
+
+def validate_research_response(data) -> List[str]:
+    """Check a parsed response against the content/references schema."""
+    if not isinstance(data, dict):
+        return ["Top-level value must be a JSON object"]
+
+    if "error" in data:
+        return [] if isinstance(data["error"], str) else ["'error' must be a string"]
+
+    errors = []
+    content = data.get("content")
+    references = data.get("references", {})
+
+    if not isinstance(content, list) or not content:
+        errors.append("'content' must be a non-empty array")
+        content = []
+    if not isinstance(references, dict):
+        errors.append("'references' must be an object")
+        references = {}
+
+    for i, segment in enumerate(content):
+        if not isinstance(segment, dict):
+            errors.append(f"content[{i}] must be an object")
+            continue
+        if not isinstance(segment.get("text"), str):
+            errors.append(f"content[{i}].text must be a string")
+        refs = segment.get("refs", [])
+        if not isinstance(refs, list):
+            errors.append(f"content[{i}].refs must be an array")
+            continue
+        for j, ref in enumerate(refs):
+            if not isinstance(ref, str):
+                errors.append(f"content[{i}].refs[{j}] must be a string")
+            elif ref not in references:
+                errors.append(f"content[{i}] cites '{ref}' which is not defined in references")
+
+    for ref_id, ref in references.items():
+        if not isinstance(ref, dict):
+            errors.append(f"references['{ref_id}'] must be an object")
+        elif not ref.get("title"):
+            errors.append(f"references['{ref_id}'] is missing a title")
+
+    return errors
+
+
+def load_research_json(raw: str) -> Tuple[Optional[object], List[str]]:
+    """Parse the agent's final message, extracting and repairing the JSON locally if needed."""
+    try:
+        return json.loads(raw), []
+    except (json.JSONDecodeError, TypeError):
+        pass
+
+    candidate = extract_json_object(raw or "")
+    if candidate is None:
+        return None, ["No JSON object found in the response"]
+    for attempt in (candidate, repair_json(candidate)):
+        try:
+            return json.loads(attempt), []
+        except json.JSONDecodeError as e:
+            error = f"Invalid JSON: {e}"
+    return None, [error]
+
+
+def parse_research_response(raw: str) -> Tuple[Optional[dict], List[str]]:
+    """
+    Parse, locally repair and validate the agent's final message.
+
+    Returns (data, []) on success, or (None, errors) when local repair was not
+    enough and the caller should fall back to an LLM fix. Refs missing from
+    references are reported as errors, not silently dropped.
+    """
+    data, errors = load_research_json(raw)
+    if errors:
+        return None, errors
+    errors = validate_research_response(data)
+    return (data, []) if not errors else (None, errors)
@@ -0,0 +1,237 @@
+"""
+Local stand-ins for the OpenAI chat completions API and the Tavily search API.
+
+Both servers sample their latency from a log-normal distribution and inject
+errors at configurable rates, all set through environment variables:
+
+    FAKE_OPENAI_LATENCY_MEDIAN / FAKE_OPENAI_LATENCY_SIGMA   (seconds, default 1.0 / 0.5)
+    FAKE_OPENAI_ERROR_RATE / FAKE_OPENAI_429_RATE             (0..1, default 0)
+    FAKE_OPENAI_TOOL_ROUNDS                                   (search calls per agent, default 2)
+    FAKE_OPENAI_QUERY_RELEVANCE                               (analyzer verdict, default legal-complex)
+    FAKE_TAVILY_LATENCY_MEDIAN / FAKE_TAVILY_LATENCY_SIGMA    (seconds, default 0.8 / 0.5)
+    FAKE_TAVILY_ERROR_RATE / FAKE_TAVILY_429_RATE             (0..1, default 0)
+    FAKE_TAVILY_RAW_CONTENT_BYTES                             (per result, default 20000)
+
+The fake model follows the agent's real shape: the lead agent calls the
+query-analyzer and then the researcher subagents through the `task` tool
+(unless the parallel research phase already ran them), every agent runs its
+search rounds, the analyzer answers with a "Query Relevance" breakdown,
+researchers with findings, and the lead agent with the final JSON.
+
+Run with e.g. `uvicorn loadtest.fake_upstreams:openai_app --port 9001`.
+"""
+import os
+import re
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def _env(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+async def _simulate_upstream(prefix: str):
+    """Sleep for a sampled latency; return an error response to send instead, if one is injected."""
+    median = _env(f"{prefix}_LATENCY_MEDIAN", 1.0 if prefix == "FAKE_OPENAI" else 0.8)
+    sigma = _env(f"{prefix}_LATENCY_SIGMA", 0.5)
+    await asyncio.sleep(random.lognormvariate(math.log(max(median, 1e-3)), sigma))
+
+    roll = random.random()
+    rate_limited = _env(f"{prefix}_429_RATE", 0)
+    if roll < rate_limited:
+        return JSONResponse(
+            {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+            status_code=429,
+            headers={"retry-after": "1"},
+        )
+    if roll < rate_limited + _env(f"{prefix}_ERROR_RATE", 0):
+        return JSONResponse({"error": {"message": "Injected upstream failure", "type": "server_error"}}, status_code=500)
+    return None
+
+
+openai_app = FastAPI(title="Fake OpenAI")
+
+
+def _final_answer(detailed: bool) -> str:
+    sections = 15 if detailed else 4
+    return json.dumps({
+        "content": [
+            {"text": f"Section {i + 1} of the fake legal analysis. " * (20 if detailed else 5), "refs": [f"ref{i % 3 + 1}"]}
+            for i in range(sections)
+        ],
+        "references": {
+            f"ref{i}": {
+                "title": f"Fake authority {i}",
+                "url": f"https://example.gov.in/authority/{i}",
+                "authors": "Load test",
+                "year": 2024,
+                "type": "case",
+            }
+            for i in range(1, 4)
+        },
+    })
+
+
+RESEARCHERS = ("case-law-researcher", "statutory-researcher")
+
+
+def _analysis() -> str:
+    relevance = os.getenv("FAKE_OPENAI_QUERY_RELEVANCE", "legal-complex")
+    return (
+        "QUERY BREAKDOWN:\n"
+        f"- **Query Relevance:** {relevance}\n"
+        "- **Query Type:** statutory\n"
+        "- **Jurisdiction:** central\n"
+        "- **Legal Domain:** corporate law\n"
+        "- **Complexity:** moderate"
+    )
+
+
+def _findings(system: str) -> str:
+    role = re.search(r"ROLE: ([A-Z ]+)", system)
+    role = role.group(1).title() if role else "Researcher"
+    return "\n".join(
+        f"{i + 1}. " + f"Fake finding of the {role} (https://example.gov.in/authority/{i + 1}). " * 5
+        for i in range(4)
+    )
+
+
+def _tool_functions(tools: list) -> dict:
+    return {tool.get("function", {}).get("name", ""): tool.get("function", {}) for tool in tools or []}
+
+
+def _search_tool(functions: dict):
+    for name, function in functions.items():
+        if "search" in name and "query" in function.get("parameters", {}).get("properties", {}):
+            return name
+    return None
+
+
+def _subagent_types(task_function: dict) -> list:
+    """Subagents listed in the task tool's description as "- name: description"."""
+    names = re.findall(r"^- ([\w-]+):", task_function.get("description", ""), re.MULTILINE)
+    return [name for name in names if name != "general-purpose"]
+
+
+def _called_tools(messages: list) -> list:
+    """(tool name, arguments) of every tool call the assistant has made so far."""
+    calls = []
+    for m in messages:
+        for call in m.get("tool_calls") or []:
+            function = call.get("function", {})
+            try:
+                arguments = json.loads(function.get("arguments") or "{}")
+            except json.JSONDecodeError:
+                arguments = {}
+            calls.append((function.get("name"), arguments))
+    return calls
+
+
+def _tool_call(name: str, arguments: dict) -> dict:
+    return {
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {"name": name, "arguments": json.dumps(arguments)},
+    }
+
+
+def _next_tool_calls(messages: list, functions: dict, user: str) -> list:
+    """The tool calls the fake model makes next, or [] when it is ready to answer."""
+    transcript = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "user")
+    called = _called_tools(messages)
+
+    if "task" in functions:
+        types = _subagent_types(functions["task"])
+        used = {arguments.get("subagent_type") for name, arguments in called if name == "task"}
+        if (
+            "query-analyzer" in types
+            and "query-analyzer" not in used
+            and "query-analyzer subagent has already been run" not in transcript
+        ):
+            return [_tool_call("task", {"description": user[:500], "subagent_type": "query-analyzer"})]
+        if "research phase is complete" not in transcript:
+            pending = [t for t in RESEARCHERS if t in types and t not in used]
+            if pending:
+                # Several calls in one message, as the lead agent does to research in parallel.
+                return [_tool_call("task", {"description": user[:500], "subagent_type": t}) for t in pending]
+
+    search = _search_tool(functions)
+    searches = sum(1 for name, _ in called if name == search)
+    if search and searches < int(_env("FAKE_OPENAI_TOOL_ROUNDS", 2)):
+        return [_tool_call(search, {"query": user[:200]})]
+    return []
+
+
+@openai_app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    error = await _simulate_upstream("FAKE_OPENAI")
+    if error is not None:
+        return error
+
+    messages = body.get("messages", [])
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+
+    message = {"role": "assistant", "content": None}
+    tool_calls = _next_tool_calls(messages, _tool_functions(body.get("tools")), user)
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+        finish_reason = "tool_calls"
+    else:
+        if "ROLE: LEGAL QUERY ANALYZER" in system:
+            message["content"] = _analysis()
+        elif "ROLE: LEAD LEGAL RESEARCH AGENT" in system:
+            message["content"] = _final_answer("MODE: DETAILED" in system)
+        else:
+            message["content"] = _findings(system)
+        finish_reason = "stop"
+
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+    completion_tokens = len(message["content"] or "") // 4 + 20
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": prompt_tokens // 2},
+        },
+    }
+
+
+tavily_app = FastAPI(title="Fake Tavily")
+
+
+@tavily_app.post("/search")
+async def search(request: Request):
+    body = await request.json()
+    error = await _simulate_upstream("FAKE_TAVILY")
+    if error is not None:
+        return error
+
+    query = body.get("query", "")
+    raw_bytes = int(_env("FAKE_TAVILY_RAW_CONTENT_BYTES", 20000))
+    domains = ["indiacode.nic.in", "main.sci.gov.in", "www.livelaw.in", "www.barandbench.com", "www.mca.gov.in"]
+    results = []
+    for i in range(int(body.get("max_results", 5))):
+        results.append({
+            "title": f"Result {i + 1} for {query[:60]}",
+            "url": f"https://{domains[i % len(domains)]}/doc/{uuid.uuid4().hex[:8]}",
+            "content": f"Snippet about {query[:120]}",
+            "score": round(random.uniform(0.4, 0.95), 3),
+            "raw_content": ("Lorem ipsum legal text. " * (raw_bytes // 24 + 1))[:raw_bytes]
+            if body.get("include_raw_content") else None,
+        })
+    return {"query": query, "results": results, "response_time": 0.0}
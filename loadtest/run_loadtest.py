@@ -0,0 +1,301 @@
+"""
+HTTP load test for app2.py against local fake OpenAI and Tavily servers.
+
+Starts the fake upstreams and the FastAPI app as subprocesses, drives one or
+more concurrent client profiles against POST /research and reports latency
+percentiles, throughput, error and timeout rates, plus the app's thread count
+and RSS over time.
+
+    python -m loadtest.run_loadtest --profile normal:20:100 --profile detailed:5:20
+    python -m loadtest.run_loadtest --execution-mode process --workers 4 --openai-latency 2.0,0.6
+
+A profile is MODE:CONCURRENCY:REQUESTS. Use --app-url to target an already
+running instance (resource sampling then needs --app-pid).
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import List, Optional
+
+import httpx
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = [
+    "Can a private company take a loan from an LLP under Indian law?",
+    "What are the requirements for a valid arbitration agreement in India?",
+    "Is anticipatory bail available for offences under the PMLA?",
+    "What is the limitation period for filing a suit for recovery of money?",
+    "Can a director of a private company be held personally liable for company debts?",
+]
+
+
+def parse_profile(value: str) -> dict:
+    try:
+        mode, concurrency, requests = value.split(":")
+        assert mode in ("normal", "detailed")
+        return {"mode": mode, "concurrency": int(concurrency), "requests": int(requests)}
+    except (ValueError, AssertionError):
+        raise argparse.ArgumentTypeError("profile must be MODE:CONCURRENCY:REQUESTS with MODE normal or detailed")
+
+
+def parse_latency(value: str) -> tuple:
+    median, sigma = value.split(",")
+    return float(median), float(sigma)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                for child in f.read().split():
+                    pids.extend(_process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def sample_resources(pid: int) -> dict:
+    """Thread count and RSS of a process and its descendants (e.g. worker pool processes)."""
+    threads = 0
+    rss_kb = 0
+    processes = 0
+    for process in _process_tree(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                for line in f:
+                    if line.startswith("Threads:"):
+                        threads += int(line.split()[1])
+                    elif line.startswith("VmRSS:"):
+                        rss_kb += int(line.split()[1])
+            processes += 1
+        except OSError:
+            continue
+    return {"threads": threads, "rss_mb": round(rss_kb / 1024, 1), "processes": processes}
+
+
+def start_server(target: str, port: int, env: dict, log_dir: str) -> subprocess.Popen:
+    log = open(os.path.join(log_dir, f"{target.replace(':', '_')}.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_until_up(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=2)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def run_profile(client: httpx.AsyncClient, app_url: str, profile: dict, timeout: float, records: list):
+    counter = iter(range(profile["requests"]))
+
+    async def worker():
+        for i in counter:
+            query = f"{QUERIES[i % len(QUERIES)]} (load test {profile['mode']} #{i})"
+            start = time.monotonic()
+            outcome = "ok"
+            try:
+                response = await client.post(
+                    f"{app_url}/research",
+                    json={"query": query, "mode": profile["mode"]},
+                    timeout=timeout,
+                )
+                if response.status_code != 200:
+                    outcome = "error"
+                else:
+                    body = response.json()
+                    if isinstance(body, dict) and "error" in body:
+                        outcome = "timeout" if body["error"] == "Request timeout" else "error"
+            except httpx.TimeoutException:
+                outcome = "timeout"
+            except (httpx.HTTPError, ValueError):
+                outcome = "error"
+            records.append({
+                "mode": profile["mode"],
+                "latency": time.monotonic() - start,
+                "outcome": outcome,
+                "finished_at": time.monotonic(),
+            })
+
+    await asyncio.gather(*[worker() for _ in range(profile["concurrency"])])
+
+
+async def sample_loop(pid: Optional[int], interval: float, started: float, samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        if pid is not None:
+            samples.append({"t": round(time.monotonic() - started, 1), **sample_resources(pid)})
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def summarize(records: list, samples: list, elapsed: float) -> dict:
+    report = {"elapsed_seconds": round(elapsed, 2), "profiles": {}}
+    for mode in sorted({record["mode"] for record in records}):
+        subset = [record for record in records if record["mode"] == mode]
+        ok_latencies = [record["latency"] for record in subset if record["outcome"] == "ok"]
+        report["profiles"][mode] = {
+            "requests": len(subset),
+            "ok": len(ok_latencies),
+            "error_rate": round(sum(r["outcome"] == "error" for r in subset) / len(subset), 3),
+            "timeout_rate": round(sum(r["outcome"] == "timeout" for r in subset) / len(subset), 3),
+            "p50": percentile(ok_latencies, 50),
+            "p95": percentile(ok_latencies, 95),
+            "p99": percentile(ok_latencies, 99),
+            "throughput_rps": round(len(ok_latencies) / elapsed, 3) if elapsed else 0.0,
+        }
+    if samples:
+        report["resources"] = {
+            "max_threads": max(sample["threads"] for sample in samples),
+            "max_rss_mb": max(sample["rss_mb"] for sample in samples),
+            "timeline": samples,
+        }
+    return report
+
+
+def print_report(report: dict):
+    print(f"\nElapsed: {report['elapsed_seconds']}s\n")
+    print(f"{'mode':<10}{'reqs':>6}{'ok':>6}{'err%':>7}{'tmo%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>8}")
+    for mode, stats in report["profiles"].items():
+        fmt = lambda value: f"{value:.2f}" if value is not None else "-"
+        print(
+            f"{mode:<10}{stats['requests']:>6}{stats['ok']:>6}"
+            f"{stats['error_rate'] * 100:>7.1f}{stats['timeout_rate'] * 100:>7.1f}"
+            f"{fmt(stats['p50']):>9}{fmt(stats['p95']):>9}{fmt(stats['p99']):>9}{stats['throughput_rps']:>8.2f}"
+        )
+
+    resources = report.get("resources")
+    if resources:
+        print(f"\nMax threads: {resources['max_threads']}   Max RSS: {resources['max_rss_mb']} MB\n")
+        print(f"{'t(s)':>8}{'threads':>9}{'rss(MB)':>10}{'procs':>7}")
+        timeline = resources["timeline"]
+        step = max(1, len(timeline) // 30)
+        for sample in timeline[::step]:
+            print(f"{sample['t']:>8}{sample['threads']:>9}{sample['rss_mb']:>10}{sample['processes']:>7}")
+
+
+async def main(args):
+    processes = []
+    app_url = args.app_url
+    app_pid = args.app_pid
+    log_dir = tempfile.mkdtemp(prefix="deepr_loadtest_")
+
+    try:
+        if app_url is None:
+            env = dict(os.environ)
+            env.update({
+                "FAKE_OPENAI_LATENCY_MEDIAN": str(args.openai_latency[0]),
+                "FAKE_OPENAI_LATENCY_SIGMA": str(args.openai_latency[1]),
+                "FAKE_OPENAI_ERROR_RATE": str(args.openai_error_rate),
+                "FAKE_OPENAI_429_RATE": str(args.openai_429_rate),
+                "FAKE_TAVILY_LATENCY_MEDIAN": str(args.tavily_latency[0]),
+                "FAKE_TAVILY_LATENCY_SIGMA": str(args.tavily_latency[1]),
+                "FAKE_TAVILY_ERROR_RATE": str(args.tavily_error_rate),
+                "FAKE_TAVILY_429_RATE": str(args.tavily_429_rate),
+            })
+            openai_port, tavily_port, app_port = args.base_port, args.base_port + 1, args.base_port + 2
+            processes.append(start_server("loadtest.fake_upstreams:openai_app", openai_port, env, log_dir))
+            processes.append(start_server("loadtest.fake_upstreams:tavily_app", tavily_port, env, log_dir))
+
+            env.update({
+                "OPENAI_API_KEY": "fake-key",
+                "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+                "TAVILY_API_KEY": "fake-key",
+                "TAVILY_API_BASE_URL": f"http://127.0.0.1:{tavily_port}",
+                "DEEPR_STORE_PATH": os.path.join(log_dir, "store.sqlite3"),
+                "BLOB_STORE_PATH": os.path.join(log_dir, "blobs"),
+                "RESEARCH_EXECUTION_MODE": args.execution_mode,
+            })
+            if args.workers:
+                env["RESEARCH_WORKERS"] = str(args.workers)
+            app = start_server("app2:app", app_port, env, log_dir)
+            processes.append(app)
+            app_url, app_pid = f"http://127.0.0.1:{app_port}", app.pid
+
+            await wait_until_up(f"http://127.0.0.1:{openai_port}/docs")
+            await wait_until_up(f"http://127.0.0.1:{tavily_port}/docs")
+        await wait_until_up(f"{app_url}/health", timeout=120)
+
+        records, samples = [], []
+        stop = asyncio.Event()
+        started = time.monotonic()
+        sampler = asyncio.create_task(sample_loop(app_pid, args.sample_interval, started, samples, stop))
+
+        limits = httpx.Limits(max_connections=sum(p["concurrency"] for p in args.profile) + 10)
+        async with httpx.AsyncClient(limits=limits) as client:
+            await asyncio.gather(*[run_profile(client, app_url, p, args.timeout, records) for p in args.profile])
+
+        elapsed = time.monotonic() - started
+        stop.set()
+        await sampler
+
+        report = summarize(records, samples, elapsed)
+        print_report(report)
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump(report, f, indent=2)
+        print(f"\nServer logs: {log_dir}")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load test app2.py against fake OpenAI and Tavily servers")
+    parser.add_argument("--profile", type=parse_profile, action="append",
+                        help="MODE:CONCURRENCY:REQUESTS, repeatable (default normal:10:50)")
+    parser.add_argument("--execution-mode", choices=["thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes in process mode")
+    parser.add_argument("--openai-latency", type=parse_latency, default=(1.0, 0.5), help="MEDIAN,SIGMA in seconds")
+    parser.add_argument("--tavily-latency", type=parse_latency, default=(0.8, 0.5), help="MEDIAN,SIGMA in seconds")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-429-rate", type=float, default=0.0)
+    parser.add_argument("--tavily-error-rate", type=float, default=0.0)
+    parser.add_argument("--tavily-429-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=330.0, help="client-side request timeout in seconds")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="seconds between resource samples")
+    parser.add_argument("--base-port", type=int, default=9100, help="fake OpenAI, fake Tavily and app use this port and the next two")
+    parser.add_argument("--app-url", default=None, help="target an already running app instead of starting one")
+    parser.add_argument("--app-pid", type=int, default=None, help="pid of the running app, for resource sampling")
+    parser.add_argument("--json-out", default=None, help="also write the report as JSON to this path")
+    return parser
+
+
+if __name__ == "__main__":
+    arguments = build_parser().parse_args()
+    arguments.profile = arguments.profile or [parse_profile("normal:10:50")]
+    asyncio.run(main(arguments))
@@ -0,0 +1,108 @@
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+
+SEARCH_PREFETCH = os.getenv("SEARCH_PREFETCH", "1") == "1"
+# Longest a tool call waits on an in-flight prefetch before searching itself.
+SEARCH_PREFETCH_WAIT = float(os.getenv("SEARCH_PREFETCH_WAIT", "15"))
+
+# Shared by all runs; prefetch threads do not inherit the caller's context, so
+# their own searches never consult (and wait on) a prefetcher.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SEARCH_PREFETCH_WORKERS", "8")),
+    thread_name_prefix="search-prefetch",
+)
+
+
+class SearchPrefetcher:
+    """
+    Run-scoped speculative searches.
+
+    Searches that are likely to be issued later in the run are started in the
+    background as soon as the query arrives. When a tool call later asks for
+    the same search (as decided by key_fn) it takes the in-flight or finished
+    result instead of issuing its own request; take_all hands every remaining
+    result to the caller at once. Unclaimed prefetches are cancelled (if not yet
+    started) or discarded when the run ends.
+    """
+
+    def __init__(self, search_fn: Callable[[dict], dict], key_fn: Callable[[dict], str]):
+        self._search_fn = search_fn
+        self._key_fn = key_fn
+        self._futures = {}
+        self._claimed = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.hits = 0
+        self.cancelled = 0
+
+    def prefetch(self, params: dict):
+        key = self._key_fn(params)
+        with self._lock:
+            if key not in self._futures:
+                self._futures[key] = _executor.submit(self._search_fn, params)
+
+    def take(self, params: dict) -> Optional[dict]:
+        """
+        Return the prefetched result for these params, waiting (up to
+        SEARCH_PREFETCH_WAIT) if it is in flight. A prefetch still queued behind
+        other runs' prefetches is cancelled and None returned, so the caller
+        searches inline instead of waiting on the shared pool.
+        """
+        return self._take(self._key_fn(params), SEARCH_PREFETCH_WAIT)
+
+    def take_all(self) -> list:
+        """Claim every prefetch not yet taken, as take does, and return their results (waiting SEARCH_PREFETCH_WAIT in all)."""
+        with self._lock:
+            keys = [key for key in self._futures if key not in self._claimed]
+        deadline = time.monotonic() + SEARCH_PREFETCH_WAIT
+        results = []
+        for key in keys:
+            result = self._take(key, max(0.0, deadline - time.monotonic()))
+            if result is not None:
+                results.append(result)
+        return results
+
+    def _take(self, key: str, timeout: float) -> Optional[dict]:
+        with self._lock:
+            future: Optional[Future] = self._futures.get(key)
+            if future is None or key in self._claimed:
+                return None
+            self._claimed.add(key)
+            if future.cancel():
+                self.cancelled += 1
+                return None
+        try:
+            result = future.result(timeout=timeout)
+        except Exception:
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for key, future in self._futures.items():
+                if key not in self._claimed and future.cancel():
+                    self.cancelled += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            prefetched = len(self._futures)
+            return {
+                "prefetched": prefetched,
+                "hits": self.hits,
+                "unused": prefetched - self.hits,
+                "cancelled": self.cancelled,
+                "hit_rate": round(self.hits / prefetched, 3) if prefetched else 0.0,
+            }
+
+
+current_prefetcher: ContextVar[Optional[SearchPrefetcher]] = ContextVar("current_prefetcher", default=None)
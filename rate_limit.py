@@ -0,0 +1,255 @@
+import os
+import time
+import random
+import threading
+from typing import Callable, Optional
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Best-effort detection of HTTP 429 / quota errors across client libraries."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    name = type(error).__name__
+    return "RateLimit" in name or "UsageLimitExceeded" in name
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Errors worth retrying besides rate limits: server errors, timeouts, dropped connections."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Classic token bucket; a rate of 0 or less disables it."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the time waited."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class AIMDConcurrencyLimit:
+    """
+    Concurrency limit adjusted by additive-increase / multiplicative-decrease.
+
+    Every successful call below the latency target grows the limit by
+    1/limit (about +1 per window of `limit` calls); a 429 or a call slower
+    than the target multiplies it by `backoff_ratio`, at most once per
+    `decrease_cooldown` so a single burst of failures only counts once.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = 1,
+        maximum: int = 64,
+        backoff_ratio: float = 0.5,
+        latency_target: Optional[float] = None,
+        decrease_cooldown: float = 1.0,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff_ratio = backoff_ratio
+        self.latency_target = latency_target
+        self.decrease_cooldown = decrease_cooldown
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        """Wait for a free slot. Returns the time waited."""
+        start = time.monotonic()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            slow = self.latency_target is not None and latency is not None and latency > self.latency_target
+            now = time.monotonic()
+            if overloaded or slow:
+                if now - self._last_decrease >= self.decrease_cooldown:
+                    self.limit = max(self.minimum, self.limit * self.backoff_ratio)
+                    self._last_decrease = now
+            elif latency is not None:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """
+    Process-wide limiter for one upstream: a token bucket for request rate, an
+    AIMD concurrency limit driven by 429s and latency, and jittered exponential
+    backoff on rate-limit and transient errors.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float,
+        max_concurrency: int,
+        latency_target: Optional[float] = None,
+        max_retries: int = 4,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AIMDConcurrencyLimit(
+            initial=max(1, max_concurrency // 2),
+            maximum=max_concurrency,
+            latency_target=latency_target,
+        )
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._rate_limited = 0
+        self._retries = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _record_wait(self, waited: float):
+        with self._lock:
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Call fn under the limiter, retrying on rate-limit and transient errors."""
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire() + self.concurrency.acquire()
+            self._record_wait(waited)
+
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                self.concurrency.release(overloaded=rate_limited)
+                with self._lock:
+                    self._calls += 1
+                    self._rate_limited += int(rate_limited)
+                if attempt >= self.max_retries or not (rate_limited or is_transient_error(e)):
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                attempt += 1
+                with self._lock:
+                    self._retries += 1
+                time.sleep(delay)
+                self._record_wait(delay)
+                continue
+
+            self.concurrency.release(latency=time.monotonic() - start)
+            with self._lock:
+                self._calls += 1
+            return result
+
+    def share(self, processes: int):
+        """Keep 1/processes of the configured rate, burst and concurrency for this process."""
+        with self.bucket._lock:
+            self.bucket.rate /= processes
+            self.bucket.capacity = max(self.bucket.capacity / processes, 1)
+            self.bucket._tokens = min(self.bucket._tokens, self.bucket.capacity)
+        with self.concurrency._cond:
+            self.concurrency.maximum = max(self.concurrency.minimum, self.concurrency.maximum // processes)
+            self.concurrency.limit = min(self.concurrency.limit, self.concurrency.maximum)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "rate": round(self.bucket.rate, 3),
+                "calls": self._calls,
+                "rate_limited": self._rate_limited,
+                "retries": self._retries,
+                "wait_seconds_total": round(self._wait_total, 3),
+                "wait_seconds_max": round(self._wait_max, 3),
+                "concurrency_limit": round(self.concurrency.limit, 2),
+                "in_flight": self.concurrency.in_flight,
+            }
+
+
+def _limiter_from_env(
+    name: str,
+    prefix: str,
+    rate: float,
+    burst: float,
+    max_concurrency: int,
+    latency_target: float,
+    max_retries: int = 4,
+):
+    return RateLimiter(
+        name,
+        rate=float(os.getenv(f"{prefix}_RATE", str(rate))),
+        burst=float(os.getenv(f"{prefix}_BURST", str(burst))),
+        max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(max_concurrency))),
+        latency_target=float(os.getenv(f"{prefix}_LATENCY_TARGET", str(latency_target))),
+        max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", str(max_retries))),
+    )
+
+
+# Search retries are kept low: failing searches fall back to the cache through the
+# circuit breaker, which should not wait out a long chain of retries first.
+tavily_limiter = _limiter_from_env(
+    "tavily", "TAVILY", rate=5, burst=10, max_concurrency=16, latency_target=15, max_retries=1
+)
+openai_limiter = _limiter_from_env("openai", "OPENAI", rate=10, burst=20, max_concurrency=32, latency_target=90)
+
+
+def share_budgets(processes: int):
+    """
+    Split every limiter's budget across processes. The configured TAVILY_* and
+    OPENAI_* budgets are for the whole deployment; each worker process of the
+    process execution mode calls this with the pool size.
+    """
+    if processes > 1:
+        for limiter in (tavily_limiter, openai_limiter):
+            limiter.share(processes)
+
+
+def rate_limit_metrics() -> dict:
+    return {limiter.name: limiter.metrics() for limiter in (tavily_limiter, openai_limiter)}
@@ -0,0 +1,79 @@
+import os
+import re
+from urllib.parse import urlparse
+
+
+# Domains whose content is treated as authoritative for Indian legal research.
+AUTHORITATIVE_DOMAINS = (
+    "gov.in",
+    "nic.in",
+    "sci.gov.in",
+    "indiacode.nic.in",
+    "legislative.gov.in",
+    "egazette.gov.in",
+    "mca.gov.in",
+    "rbi.org.in",
+    "sebi.gov.in",
+    "lawcommissionofindia.nic.in",
+    "ecourts.gov.in",
+)
+
+SEARCH_INITIAL_RESULTS = int(os.getenv("SEARCH_INITIAL_RESULTS", "4"))
+SEARCH_COVERAGE_THRESHOLD = float(os.getenv("SEARCH_COVERAGE_THRESHOLD", "0.7"))
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "from", "by", "with", "under",
+    "is", "are", "was", "be", "can", "could", "should", "would", "may", "must", "do", "does",
+    "what", "which", "who", "whom", "when", "where", "why", "how", "if", "it", "its", "this",
+    "that", "these", "those", "i", "my", "we", "our", "you", "your", "any", "as", "at", "not",
+    "law", "legal", "india", "indian",
+}
+
+
+def query_terms(query: str) -> set:
+    """Significant lower-cased terms of a query, without stopwords."""
+    return {term for term in re.findall(r"[a-z0-9]+", query.lower()) if len(term) > 2 and term not in _STOPWORDS}
+
+
+def is_authoritative(url: str) -> bool:
+    host = urlparse(url or "").netloc.lower()
+    return any(host == domain or host.endswith("." + domain) for domain in AUTHORITATIVE_DOMAINS)
+
+
+def coverage(query: str, results: list) -> dict:
+    """
+    Score how well a result set covers a query, locally and without LLM calls.
+
+    Combines the share of query terms found in titles/snippets and the search
+    engine's own relevance scores. Authoritative sources add a bonus on top:
+    case law and commentary are rarely on government domains, so a strong
+    result set must be able to pass without them.
+    """
+    terms = query_terms(query)
+    text = " ".join(
+        f"{result.get('title', '')} {result.get('content', '')}" for result in results
+    ).lower()
+    found = {term for term in terms if term in text}
+    term_coverage = len(found) / len(terms) if terms else 1.0
+
+    authoritative = sum(1 for result in results if is_authoritative(result.get("url", "")))
+    relevance_scores = [result["score"] for result in results if isinstance(result.get("score"), (int, float))]
+    relevance = sum(relevance_scores) / len(relevance_scores) if relevance_scores else 0.5
+
+    score = min(1.0, 0.7 * term_coverage + 0.3 * relevance + 0.15 * min(1.0, authoritative / 2))
+    return {
+        "score": round(score, 3),
+        "term_coverage": round(term_coverage, 3),
+        "authoritative_results": authoritative,
+        "missing_terms": sorted(terms - found),
+    }
+
+
+def escalation_steps(max_results: int) -> list:
+    """
+    Result counts to try in order: a small first request and, if that is not
+    enough, a single escalation straight to max_results. Every step is a full
+    search, so intermediate steps would only add round trips and payload.
+    """
+    initial = min(SEARCH_INITIAL_RESULTS, max_results)
+    return [initial] if initial >= max_results else [initial, max_results]
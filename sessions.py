@@ -0,0 +1,128 @@
+import os
+import json
+import threading
+from contextvars import ContextVar
+from typing import Optional
+
+
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "5"))
+SESSION_CONTEXT_TURNS = int(os.getenv("SESSION_CONTEXT_TURNS", "3"))
+SESSION_MAX_DOCUMENTS = int(os.getenv("SESSION_MAX_DOCUMENTS", "60"))
+SNIPPET_CHARS = 500
+
+
+class RunDocuments:
+    """Search results retrieved during one run, de-duplicated by URL."""
+
+    def __init__(self):
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def add(self, results: list):
+        with self._lock:
+            for result in results:
+                url = result.get("url")
+                if not url:
+                    continue
+                self.documents[url] = {
+                    "title": result.get("title", ""),
+                    "url": url,
+                    "snippet": (result.get("content") or "")[:SNIPPET_CHARS],
+                    "source_id": result.get("raw_content_source_id"),
+                }
+
+
+# Set by research_legal_query; tool calls run in a copy of the caller's context.
+current_run_documents: ContextVar[Optional[RunDocuments]] = ContextVar("current_run_documents", default=None)
+
+
+def new_session() -> dict:
+    return {"turns": [], "turn_count": 0, "documents": {}, "references": {}, "files": {}}
+
+
+def followup_messages(session: dict) -> list:
+    """Earlier turns of the session as chat messages, oldest first."""
+    messages = []
+    for turn in session["turns"][-SESSION_CONTEXT_TURNS:]:
+        messages.append({"role": "user", "content": turn["query"]})
+        messages.append({"role": "assistant", "content": turn["answer"]})
+    return messages
+
+
+def session_files(session: dict) -> dict:
+    """Agent files from earlier turns plus an index of the documents already retrieved."""
+    files = dict(session["files"])
+    if session["documents"]:
+        lines = ["# Sources retrieved earlier in this session", ""]
+        for document in session["documents"].values():
+            lines.append(f"## {document['title']}")
+            lines.append(f"URL: {document['url']}")
+            if document.get("source_id"):
+                lines.append(f"source_id: {document['source_id']} (full text via read_source)")
+            lines.append(document["snippet"])
+            lines.append("")
+        files["session/sources.md"] = "\n".join(lines)
+    if session["references"]:
+        files["session/references.json"] = json.dumps(session["references"], indent=2, ensure_ascii=False)
+    return files
+
+
+def _namespace_references(parsed: dict, known: dict, prefix: str) -> dict:
+    """
+    Give a turn's references session-wide ids. Every answer numbers its
+    references from ref1, so ids are prefixed with the turn; a source already
+    known to the session (same URL) keeps its existing id.
+    """
+    references = parsed.get("references")
+    if not isinstance(references, dict):
+        return parsed
+
+    known_by_url = {
+        ref["url"]: ref_id for ref_id, ref in known.items() if isinstance(ref, dict) and ref.get("url")
+    }
+    renamed = {}
+    for ref_id, ref in references.items():
+        url = ref.get("url") if isinstance(ref, dict) else None
+        if url in known_by_url:
+            renamed[ref_id] = known_by_url[url]
+        elif ref_id in known and known[ref_id] == ref:
+            renamed[ref_id] = ref_id
+        else:
+            renamed[ref_id] = f"{prefix}-{ref_id}"
+
+    content = parsed.get("content")
+    if isinstance(content, list):
+        content = [
+            {**segment, "refs": list(dict.fromkeys(renamed.get(ref, ref) for ref in segment["refs"]))}
+            if isinstance(segment, dict) and isinstance(segment.get("refs"), list) else segment
+            for segment in content
+        ]
+    return {
+        **parsed,
+        "content": content,
+        "references": {renamed[ref_id]: ref for ref_id, ref in references.items()},
+    }
+
+
+def update_session(session: dict, query: str, answer: str, documents: dict, files: dict) -> dict:
+    """Record a completed turn, keeping only the most recent turns and documents."""
+    turn = session.get("turn_count", len(session["turns"])) + 1
+    session["turn_count"] = turn
+    try:
+        parsed = json.loads(answer)
+    except json.JSONDecodeError:
+        parsed = {}
+    if isinstance(parsed, dict) and parsed.get("references"):
+        # The replayed answer uses the same ids as session/references.json.
+        parsed = _namespace_references(parsed, session["references"], f"t{turn}")
+        session["references"].update(parsed["references"])
+        answer = json.dumps(parsed, ensure_ascii=False)
+
+    session["turns"] = (session["turns"] + [{"query": query, "answer": answer}])[-SESSION_MAX_TURNS:]
+
+    merged = {**session["documents"], **documents}
+    session["documents"] = dict(list(merged.items())[-SESSION_MAX_DOCUMENTS:])
+    session["files"].update({
+        name: content for name, content in files.items() if not name.startswith("session/")
+    })
+    return session
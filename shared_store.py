@@ -0,0 +1,321 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Tuple
+
+
+DEFAULT_STORE_PATH = os.getenv("DEEPR_STORE_PATH", "deepr_store.sqlite3")
+JOB_TTL = float(os.getenv("JOB_TTL", "604800"))
+# Expired rows are swept at most this often (seconds) by each store instance.
+SWEEP_INTERVAL = float(os.getenv("STORE_SWEEP_INTERVAL", "300"))
+
+
+class SQLiteStore:
+    """Base class for tables kept in a SQLite file shared by every worker process."""
+
+    schema = ""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.executescript(self.schema)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process: connections must not be
+        # shared across threads or survive a fork into a worker process.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _sweep_due(self) -> bool:
+        """Throttle expiry sweeps to one per SWEEP_INTERVAL for this instance."""
+        now = time.monotonic()
+        last = getattr(self, "_last_sweep", None)
+        if last is not None and now - last < SWEEP_INTERVAL:
+            return False
+        self._last_sweep = now
+        return True
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self._local = threading.local()
+
+
+class SearchCache(SQLiteStore):
+    """
+    Search results keyed by their request parameters, with a time-to-live.
+    Entries past the TTL may still be served as stale results; they are
+    deleted once older than max_age.
+    """
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS search_cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS search_cache_created_at ON search_cache (created_at);
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, ttl: float = 86400, max_age: Optional[float] = None):
+        self.ttl = ttl
+        self.max_age = max(ttl, max_age or ttl)
+        super().__init__(path)
+
+    def __getstate__(self):
+        return {"path": self.path, "ttl": self.ttl, "max_age": self.max_age}
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.ttl = state["ttl"]
+        self.max_age = state["max_age"]
+
+    @staticmethod
+    def make_key(params: dict) -> str:
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get_with_age(self, params: dict) -> Tuple[Optional[dict], Optional[float]]:
+        """Return (value, age in seconds) regardless of the TTL, or (None, None)."""
+        row = self._connect().execute(
+            "SELECT value, created_at FROM search_cache WHERE key = ?",
+            (self.make_key(params),),
+        ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def get(self, params: dict) -> Optional[dict]:
+        value, age = self.get_with_age(params)
+        if value is None or age > self.ttl:
+            return None
+        return value
+
+    def set(self, params: dict, value: dict):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (self.make_key(params), json.dumps(value), time.time()),
+            )
+        if self._sweep_due():
+            self._evict()
+
+    def _evict(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM search_cache WHERE created_at < ?", (time.time() - self.max_age,))
+
+
+class JobStore(SQLiteStore):
+    """Research job status, results and progress events, deleted ttl seconds after the job's last update."""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        query TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        status TEXT NOT NULL,
+        worker_pid INTEGER,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS job_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL,
+        event TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS job_events_job_id ON job_events (job_id);
+    CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);
+    CREATE INDEX IF NOT EXISTS job_events_created_at ON job_events (created_at);
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, ttl: float = JOB_TTL):
+        self.ttl = ttl
+        super().__init__(path)
+
+    def __getstate__(self):
+        return {"path": self.path, "ttl": self.ttl}
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.ttl = state["ttl"]
+
+    def create(self, query: str, mode: str) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, query, mode, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, query, mode, "queued", now, now),
+            )
+        if self._sweep_due():
+            self._evict()
+        return job_id
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+            conn.execute("DELETE FROM job_events WHERE created_at < ?", (cutoff,))
+
+    def update(
+        self,
+        job_id: str,
+        status: str,
+        result: Optional[str] = None,
+        error: Optional[str] = None,
+        worker_pid: Optional[int] = None,
+    ):
+        """Update a job; a job that timed out keeps that status even if its run finishes later."""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                """UPDATE jobs SET status = ?,
+                       result = COALESCE(?, result),
+                       error = COALESCE(?, error),
+                       worker_pid = COALESCE(?, worker_pid),
+                       updated_at = ?
+                   WHERE job_id = ? AND status != 'timeout'""",
+                (status, result, error, worker_pid, time.time(), job_id),
+            )
+
+    def add_event(self, job_id: str, event: dict):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO job_events (job_id, event, created_at) VALUES (?, ?, ?)",
+                (job_id, json.dumps(event, default=str), time.time()),
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT job_id, query, mode, status, worker_pid, result, error, created_at, updated_at "
+            "FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(
+            ["job_id", "query", "mode", "status", "worker_pid", "result", "error", "created_at", "updated_at"],
+            row,
+        ))
+        job["events"] = [
+            json.loads(event)
+            for (event,) in conn.execute(
+                "SELECT event FROM job_events WHERE job_id = ? ORDER BY id", (job_id,)
+            )
+        ]
+        return job
+
+
+class MetricsStore(SQLiteStore):
+    """Latest metrics snapshot published by each worker process."""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS process_metrics (
+        pid INTEGER PRIMARY KEY,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    """
+
+    def publish(self, data: dict):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO process_metrics (pid, data, updated_at) VALUES (?, ?, ?)",
+                (os.getpid(), json.dumps(data, default=str), time.time()),
+            )
+
+    def all(self) -> dict:
+        return {
+            str(pid): {**json.loads(data), "updated_at": updated_at}
+            for pid, data, updated_at in self._connect().execute(
+                "SELECT pid, data, updated_at FROM process_metrics ORDER BY pid"
+            )
+        }
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM process_metrics")
+
+
+class SessionStore(SQLiteStore):
+    """Conversation sessions with a time-to-live and a total size budget (least recently used evicted first)."""
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, ttl: float = 86400, max_bytes: int = 256 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        super().__init__(path)
+
+    def __getstate__(self):
+        return {"path": self.path, "ttl": self.ttl, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.ttl = state["ttl"]
+        self.max_bytes = state["max_bytes"]
+
+    def get(self, session_id: str) -> Optional[dict]:
+        row = self._connect().execute(
+            "SELECT data, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def save(self, session_id: str, data: dict):
+        encoded = json.dumps(data, ensure_ascii=False)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, size, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, encoded, len(encoded.encode("utf-8")), time.time()),
+            )
+        self._evict()
+
+    def _evict(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM sessions").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for session_id, size in conn.execute(
+                "SELECT session_id, size FROM sessions ORDER BY updated_at"
+            ).fetchall():
+                conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
@@ -0,0 +1,53 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Generic, TypeVar
+
+
+T = TypeVar("T")
+
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+@contextmanager
+def timed(component: str):
+    """
+    Record how long the wrapped import or initialization took, under component.
+    Only the first successful run counts: later runs of the same block (an
+    import that is already cached, a retried build) would report ~0.
+    """
+    start = time.perf_counter()
+    yield
+    with _timings_lock:
+        _timings.setdefault(component, round(time.perf_counter() - start, 4))
+
+
+def startup_timings() -> dict:
+    """Import and initialization time in seconds per component, in the order they ran."""
+    with _timings_lock:
+        return dict(_timings)
+
+
+class Lazy(Generic[T]):
+    """A value built by factory on first use (thread-safe), with its build time recorded."""
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def get(self) -> T:
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    with timed(f"init:{self.name}"):
+                        self._value = self._factory()
+                    self._built = True
+        return self._value
@@ -1,6 +1,8 @@
 import streamlit as st
 import requests
 import json
+import re
+import time
 from typing import Generator
 
 st.set_page_config(
@@ -99,9 +101,22 @@ st.markdown("""
 
 API_URL = "http://localhost:8000"
 
+# Token updates are batched and flushed when either threshold is reached.
+TOKEN_FLUSH_INTERVAL = 0.15
+TOKEN_FLUSH_CHARS = 400
+# The section still being streamed is finalized early once it grows past this
+# (except inside a code fence or a list, which must render as one block).
+MAX_LIVE_SECTION_CHARS = 2000
+
+FENCE_RE = re.compile(r"^ {0,3}(```|~~~)")
+LIST_ITEM_RE = re.compile(r"^\s*([-*+]|\d+[.)])\s")
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+if "session_id" not in st.session_state:
+    st.session_state.session_id = None
+
 
 def stream_research(query: str) -> Generator[dict, None, None]:
     """Stream research results from the API"""
@@ -110,7 +125,7 @@ def stream_research(query: str) -> Generator[dict, None, None]:
     try:
         response = requests.post(
             endpoint,
-            json={"query": query},
+            json={"query": query, "session_id": st.session_state.session_id},
             stream=True,
             headers={"Accept": "text/event-stream"},
             timeout=300
@@ -120,6 +135,9 @@ def stream_research(query: str) -> Generator[dict, None, None]:
             yield {"type": "error", "content": f"API Error: {response.status_code}"}
             return
         
+        # Follow-up questions reuse the server-side research session.
+        st.session_state.session_id = response.headers.get("X-Session-Id", st.session_state.session_id)
+        
         for line in response.iter_lines():
             if line:
                 line = line.decode('utf-8')
@@ -147,6 +165,129 @@ def format_step(event_type: str, data: dict) -> str:
     return ""
 
 
+def split_sections(text: str, max_chars: int = MAX_LIVE_SECTION_CHARS) -> tuple:
+    """
+    Split streamed markdown into completed sections and the still-open rest.
+    
+    Sections end at blank lines, or at a line (or word) boundary once they grow
+    past max_chars, but never inside an open code fence, and a list only ends
+    at a blank line followed by a line that neither starts a list item nor is
+    indented.
+    """
+    sections = []
+    start = 0
+    in_fence = False
+    in_list = False
+    list_break = None
+    position = 0
+    # The last line is still being streamed; only complete lines are inspected.
+    for line in text.split("\n")[:-1]:
+        line_start, position = position, position + len(line) + 1
+        blank = not line.strip()
+        
+        if list_break is not None and not blank:
+            if LIST_ITEM_RE.match(line) or line[:1].isspace():
+                list_break = None
+            else:
+                sections.append(text[start:list_break])
+                start, in_list, list_break = line_start, False, None
+        
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif in_fence:
+            continue
+        elif blank:
+            if in_list:
+                if list_break is None:
+                    list_break = line_start
+            elif text[start:line_start].strip():
+                sections.append(text[start:line_start])
+                start = position
+            continue
+        elif LIST_ITEM_RE.match(line):
+            in_list = True
+        
+        if not in_fence and not in_list and position - start > max_chars:
+            sections.append(text[start:position])
+            start = position
+    
+    rest = text[start:]
+    if not in_fence and not in_list and len(rest) > max_chars and "\n" not in rest:
+        cut = rest.rfind(" ", 0, max_chars)
+        cut = cut if cut > 0 else max_chars
+        sections.append(rest[:cut])
+        rest = rest[cut:]
+    return sections, rest
+
+
+class IncrementalResponse:
+    """
+    Renders a streamed response section by section.
+    
+    Completed sections (see split_sections; code fences and lists are kept
+    whole) are written once into their own placeholder and
+    never touched again; only the section still being streamed is re-rendered,
+    and only when a batch of tokens is flushed.
+    """
+    
+    def __init__(self, placeholder):
+        self.placeholder = placeholder
+        self.container = placeholder.container()
+        self.parts = []
+        self.pending = ""
+        self.live_text = ""
+        self.live = None
+        self.last_flush = time.monotonic()
+    
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+    
+    def add(self, token: str):
+        self.parts.append(token)
+        self.pending += token
+        if len(self.pending) >= TOKEN_FLUSH_CHARS or time.monotonic() - self.last_flush >= TOKEN_FLUSH_INTERVAL:
+            self.flush()
+    
+    def _render(self, placeholder, text: str, cursor: bool = False):
+        cursor_html = '<span class="cursor"></span>' if cursor else ""
+        placeholder.markdown(f'<div class="response-text">{text}{cursor_html}</div>', unsafe_allow_html=True)
+    
+    def _finalize_section(self, section: str):
+        if not section.strip():
+            return
+        if self.live is None:
+            self.live = self.container.empty()
+        self._render(self.live, section)
+        self.live = None
+    
+    def flush(self, final: bool = False):
+        text = self.live_text + self.pending
+        self.pending = ""
+        self.last_flush = time.monotonic()
+        
+        sections, text = split_sections(text)
+        for section in sections:
+            self._finalize_section(section)
+        
+        if final:
+            self._finalize_section(text)
+            text = ""
+        elif text:
+            if self.live is None:
+                self.live = self.container.empty()
+            self._render(self.live, text, cursor=True)
+        self.live_text = text
+    
+    def replace(self, final_text: str):
+        """Render a final text that differs from what was streamed, in one pass."""
+        self._render(self.placeholder, final_text)
+        self.parts = [final_text]
+        self.pending = ""
+        self.live_text = ""
+        self.live = None
+
+
 # Header
 st.title("Legal Research Agent")
 st.markdown('<p class="subtitle">Advanced research for Indian legal queries</p>', unsafe_allow_html=True)
@@ -181,13 +322,19 @@ if query:
         full_response = ""
         research_files = {}
         should_render_response = False
-        steps = []
         
         with steps_container:
             steps_placeholder = st.empty()
+            steps_box = steps_placeholder.container()
         
         with response_container:
             response_placeholder = st.empty()
+            response = IncrementalResponse(response_placeholder)
+        
+        def add_step(step_msg: str):
+            # Each step is appended as its own element; earlier steps are not re-rendered.
+            if step_msg:
+                steps_box.markdown(f'<div class="status-step">{step_msg}</div>', unsafe_allow_html=True)
         
         try:
             for event in stream_research(query):
@@ -196,40 +343,27 @@ if query:
                 # Only show steps before streaming_node
                 if not should_render_response:
                     if event_type in ["status", "node_completed"]:
-                        step_msg = format_step(event_type, event)
-                        if step_msg:
-                            steps.append(step_msg)
-                            steps_html = "".join([f'<div class="status-step">{step}</div>' for step in steps])
-                            steps_placeholder.markdown(steps_html, unsafe_allow_html=True)
+                        add_step(format_step(event_type, event))
                     
                     elif event_type == "streaming_node":
                         should_render_response = True
-                        step_msg = format_step(event_type, event)
-                        if step_msg:
-                            steps.append(step_msg)
-                            steps_html = "".join([f'<div class="status-step">{step}</div>' for step in steps])
-                            steps_placeholder.markdown(steps_html, unsafe_allow_html=True)
+                        add_step(format_step(event_type, event))
                 
                 # After streaming_node, render tokens
                 if should_render_response:
                     if event_type == "token":
-                        full_response += event.get("content", "")
-                        response_placeholder.markdown(
-                            f'<div class="response-text">{full_response}<span class="cursor"></span></div>',
-                            unsafe_allow_html=True
-                        )
+                        response.add(event.get("content", ""))
                     
                     elif event_type == "complete":
                         research_files = event.get("files", {})
                         final_content = event.get("final_response", "")
-                        if final_content:
-                            full_response = final_content
                         
                         steps_placeholder.empty()
-                        response_placeholder.markdown(
-                            f'<div class="response-text">{full_response}</div>',
-                            unsafe_allow_html=True
-                        )
+                        if final_content and final_content != response.text:
+                            response.replace(final_content)
+                        else:
+                            response.flush(final=True)
+                        full_response = response.text
                         
                         if research_files:
                             for filename, content in research_files.items():
@@ -245,6 +379,10 @@ if query:
                         error_msg = event.get('content', 'Unknown error')
                         response_placeholder.error(f"Error: {error_msg}")
                         full_response = error_msg
+            
+            if not full_response:
+                response.flush(final=True)
+                full_response = response.text
         
         except Exception as e:
             steps_placeholder.empty()
@@ -281,6 +419,7 @@ with st.sidebar:
     
     if st.button("Clear Chat History"):
         st.session_state.messages = []
+        st.session_state.session_id = None
         st.rerun()
     
     st.markdown("---")
@@ -0,0 +1,125 @@
+import json
+
+from json_repair import (
+    extract_json_object,
+    parse_research_response,
+    prune_dangling_refs,
+    repair_json,
+    validate_research_response,
+)
+
+
+VALID = {
+    "content": [{"text": "A company may borrow from an LLP.", "refs": ["ref1"]}],
+    "references": {"ref1": {"title": "Companies Act, 2013", "url": "https://indiacode.nic.in/x"}},
+}
+
+
+def test_valid_json_passes_through():
+    data, errors = parse_research_response(json.dumps(VALID))
+    assert errors == []
+    assert data == VALID
+
+
+def test_extracts_object_from_prose_and_fences():
+    raw = "Here is the answer:\n```json\n" + json.dumps(VALID) + "\n```\nHope this helps."
+    assert json.loads(extract_json_object(raw)) == VALID
+    data, errors = parse_research_response(raw)
+    assert errors == []
+    assert data == VALID
+
+
+def test_repairs_trailing_commas_and_unescaped_quotes():
+    raw = '{"content": [{"text": "The "lender" is an LLP.", "refs": ["ref1",],},], "references": {"ref1": {"title": "T",},},}'
+    data = json.loads(repair_json(raw))
+    assert data["content"][0]["text"] == 'The "lender" is an LLP.'
+    assert data["content"][0]["refs"] == ["ref1"]
+
+
+def test_repairs_control_characters_in_strings():
+    raw = '{"content": [{"text": "line one\nline two\tend", "refs": []}], "references": {}}'
+    data = json.loads(repair_json(raw))
+    assert data["content"][0]["text"] == "line one\nline two\tend"
+
+
+def test_truncated_string_value_is_dropped_not_completed():
+    complete = json.dumps(VALID)
+    raw = complete[:complete.index("https://") + len("htt")]
+    data, errors = parse_research_response(raw)
+    assert errors == []
+    assert data["references"]["ref1"] == {"title": "Companies Act, 2013"}
+
+
+def test_truncated_array_drops_partial_trailing_element():
+    raw = '{"content": [{"text": "First.", "refs": []}, {"text": "Sec'
+    data = json.loads(repair_json(raw))
+    assert data == {"content": [{"text": "First.", "refs": []}]}
+
+
+def test_truncated_number_is_dropped():
+    raw = '{"content": [{"text": "First.", "refs": []}], "references": {"ref1": {"title": "T", "year": 20'
+    data = json.loads(repair_json(raw))
+    assert data["references"]["ref1"] == {"title": "T"}
+
+
+def test_truncated_key_without_value_is_dropped():
+    raw = '{"content": [{"text": "First.", "refs": []}], "references": {"ref1": {"title": "T", "url":'
+    data = json.loads(repair_json(raw))
+    assert data["references"]["ref1"] == {"title": "T"}
+
+
+def test_truncated_only_value_is_not_salvaged():
+    data, errors = parse_research_response('{"content": [{"text": "Cut off mid-sen')
+    assert data is None
+    assert errors
+
+
+def test_dangling_refs_are_reported():
+    raw = json.dumps({**VALID, "content": [{"text": "x", "refs": ["ref1", "ref9"]}]})
+    data, errors = parse_research_response(raw)
+    assert data is None
+    assert errors == ["content[0] cites 'ref9' which is not defined in references"]
+
+
+def test_prune_dangling_refs_counts_removed():
+    data = {**VALID, "content": [{"text": "x", "refs": ["ref1", "ref9", "ref8"]}]}
+    assert prune_dangling_refs(data) == 2
+    assert data["content"][0]["refs"] == ["ref1"]
+    assert validate_research_response(data) == []
+
+
+def test_validation_errors():
+    assert validate_research_response([]) == ["Top-level value must be a JSON object"]
+    assert validate_research_response({"error": "Query is off-topic"}) == []
+    errors = validate_research_response({"content": [], "references": {"ref1": {}}})
+    assert "'content' must be a non-empty array" in errors
+    assert "references['ref1'] is missing a title" in errors
+
+
+def test_no_json_object():
+    data, errors = parse_research_response("I could not produce an answer.")
+    assert data is None
+    assert errors == ["No JSON object found in the response"]
+
+
+def test_non_string_refs_are_reported_and_pruned():
+    raw = json.dumps({**VALID, "content": [{"text": "x", "refs": [{"id": "ref1"}, "ref1"]}]})
+    data, errors = parse_research_response(raw)
+    assert data is None
+    assert errors == ["content[0].refs[0] must be a string"]
+
+    data = json.loads(raw)
+    assert prune_dangling_refs(data) == 1
+    assert data["content"][0]["refs"] == ["ref1"]
+
+
+def test_quoted_prose_followed_by_comma_stays_in_string():
+    raw = '{"content": [{"text": "The "Act", as amended, applies.", "refs": []}], "references": {}}'
+    data = json.loads(repair_json(raw))
+    assert data["content"][0]["text"] == 'The "Act", as amended, applies.'
+
+
+def test_quoted_prose_followed_by_colon_stays_in_string():
+    raw = '{"content": [{"text": "See "Note": it applies.", "refs": []}], "references": {}}'
+    data = json.loads(repair_json(raw))
+    assert data["content"][0]["text"] == 'See "Note": it applies.'
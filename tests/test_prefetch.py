@@ -0,0 +1,29 @@
+from prefetch import SearchPrefetcher
+
+
+def _key(params: dict) -> str:
+    return " ".join(sorted(params["query"].lower().split()))
+
+
+def _prefetcher() -> SearchPrefetcher:
+    return SearchPrefetcher(lambda params: {"query": params["query"], "results": []}, _key)
+
+
+def test_take_matches_on_key_once():
+    prefetcher = _prefetcher()
+    prefetcher.prefetch({"query": "Loan from LLP"})
+    assert prefetcher.take({"query": "llp from loan"}) == {"query": "Loan from LLP", "results": []}
+    assert prefetcher.take({"query": "llp from loan"}) is None
+    assert prefetcher.summary()["hits"] == 1
+
+
+def test_take_all_claims_remaining_prefetches():
+    prefetcher = _prefetcher()
+    for query in ("one", "two", "three"):
+        prefetcher.prefetch({"query": query})
+    assert prefetcher.take({"query": "two"}) is not None
+    # Prefetches still queued are cancelled rather than waited on, as in take.
+    assert {result["query"] for result in prefetcher.take_all()} <= {"one", "three"}
+    assert prefetcher.take_all() == []
+    summary = prefetcher.summary()
+    assert summary["hits"] + summary["cancelled"] == 3
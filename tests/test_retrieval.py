@@ -0,0 +1,49 @@
+from retrieval import SEARCH_COVERAGE_THRESHOLD, coverage, escalation_steps, is_authoritative
+
+
+QUERY = "Can a private company take a loan from an LLP?"
+
+
+def _result(url: str, score: float, title: str = "Private company loan from LLP", content: str = "") -> dict:
+    return {
+        "url": url,
+        "score": score,
+        "title": title,
+        "content": content or "Whether a private company can take a loan from an LLP under section 185.",
+    }
+
+
+def test_strong_results_without_authoritative_sources_do_not_escalate():
+    results = [_result(f"https://www.livelaw.in/news/{i}", 0.9) for i in range(4)]
+    query_coverage = coverage(QUERY, results)
+    assert query_coverage["authoritative_results"] == 0
+    assert query_coverage["score"] >= SEARCH_COVERAGE_THRESHOLD
+
+
+def test_authoritative_sources_add_a_bonus():
+    results = [_result("https://www.livelaw.in/news/1", 0.6)]
+    authoritative = [_result("https://www.mca.gov.in/content/1", 0.6)]
+    assert coverage(QUERY, authoritative)["score"] > coverage(QUERY, results)["score"]
+
+
+def test_off_topic_results_escalate():
+    results = [
+        _result(f"https://example.com/{i}", 0.3, title="Company news", content="Quarterly results announced.")
+        for i in range(4)
+    ]
+    query_coverage = coverage(QUERY, results)
+    assert query_coverage["score"] < SEARCH_COVERAGE_THRESHOLD
+    assert "llp" in query_coverage["missing_terms"]
+
+
+def test_is_authoritative():
+    assert is_authoritative("https://indiacode.nic.in/handle/123")
+    assert is_authoritative("https://www.sebi.gov.in/legal")
+    assert not is_authoritative("https://www.livelaw.in/news")
+    assert not is_authoritative("https://gov.in.example.com/")
+
+
+def test_escalation_steps():
+    assert escalation_steps(10) == [4, 10]
+    assert escalation_steps(4) == [4]
+    assert escalation_steps(2) == [2]
@@ -0,0 +1,41 @@
+import time
+
+from startup import Lazy, startup_timings, timed
+
+
+def test_timed_keeps_first_successful_measurement():
+    with timed("test:repeated"):
+        time.sleep(0.05)
+    with timed("test:repeated"):
+        pass
+    assert startup_timings()["test:repeated"] >= 0.05
+
+
+def test_timed_ignores_failed_runs():
+    try:
+        with timed("test:failed"):
+            raise ImportError("missing")
+    except ImportError:
+        pass
+    assert "test:failed" not in startup_timings()
+
+
+def test_lazy_builds_once_and_retries_after_failure():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("first build fails")
+        return object()
+
+    lazy = Lazy("test_value", factory)
+    try:
+        lazy.get()
+    except RuntimeError:
+        pass
+    assert not lazy.built
+    value = lazy.get()
+    assert lazy.get() is value
+    assert len(calls) == 2
+    assert "init:test_value" in startup_timings()
@@ -0,0 +1,304 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait as wait_for_sentinels
+from threading import Lock, Thread
+from typing import Optional
+
+from shared_store import DEFAULT_STORE_PATH, JobStore, MetricsStore
+
+
+logger = logging.getLogger(__name__)
+
+# Research runs are I/O-bound (LLM and search calls), so each worker process
+# runs several of them at once on threads.
+RESEARCH_JOBS_PER_WORKER = int(os.getenv("RESEARCH_JOBS_PER_WORKER", "4"))
+# Longest a job may wait for a free slot before it is given up as timed out.
+RESEARCH_QUEUE_TIMEOUT = float(os.getenv("RESEARCH_QUEUE_TIMEOUT", "600"))
+
+_worker_jobs: Optional[JobStore] = None
+_worker_metrics: Optional[MetricsStore] = None
+
+
+class WorkerCrashed(RuntimeError):
+    """The worker process running a job exited before the job finished."""
+
+
+def _publish_metrics():
+    """Record this worker's upstream limiter, circuit breaker and startup metrics for the API process."""
+    from circuit_breaker import circuit_breaker_metrics
+    from rate_limit import rate_limit_metrics
+    from startup import startup_timings
+
+    try:
+        _worker_metrics.publish({
+            "rate_limiters": rate_limit_metrics(),
+            "circuit_breakers": circuit_breaker_metrics(),
+            "startup": startup_timings(),
+        })
+    except Exception:
+        logger.exception("Publishing metrics failed in worker %s", os.getpid())
+
+
+def _init_worker(store_path: str, warm: bool, workers: int):
+    """Runs once in each worker process: import (and optionally warm up) the agent module before the first job."""
+    global _worker_jobs, _worker_metrics
+    _worker_jobs = JobStore(store_path)
+    _worker_metrics = MetricsStore(store_path)
+    import deepr_withref
+    from rate_limit import share_budgets
+
+    # Rate limits are per process; the pool as a whole keeps to the configured budgets.
+    share_budgets(workers)
+    if warm:
+        # A failure here must not break the worker; anything not built is built on first use.
+        try:
+            deepr_withref.warm_up()
+        except Exception:
+            logger.exception("Warm-up failed in worker %s", os.getpid())
+    _publish_metrics()
+
+
+def _run_job(job_id: str, query: str, mode: str, session_id: Optional[str], events) -> str:
+    """Execute one research job inside a worker process."""
+    from deepr_withref import research_legal_query
+
+    _worker_jobs.update(job_id, "running", worker_pid=os.getpid())
+    events.put(("event", job_id, {"type": "status", "content": f"Started in worker {os.getpid()}"}))
+
+    try:
+        result = research_legal_query(
+            query=query,
+            verbose=False,
+            mode=mode,
+            on_event=lambda event: events.put(("event", job_id, event)),
+            session_id=session_id,
+        )
+    except Exception as e:
+        _worker_jobs.update(job_id, "failed", error=str(e))
+        raise
+    finally:
+        _publish_metrics()
+
+    _worker_jobs.update(job_id, "completed", result=result)
+    return result
+
+
+def _job_loop(jobs, events):
+    while True:
+        item = jobs.get()
+        if item is None:
+            return
+        job_id, query, mode, session_id = item
+        events.put(("started", job_id, os.getpid()))
+        try:
+            events.put(("result", job_id, _run_job(job_id, query, mode, session_id, events)))
+        except Exception as e:
+            events.put(("error", job_id, str(e)))
+
+
+def _worker_main(store_path: str, warm: bool, workers: int, jobs_per_worker: int, jobs, events):
+    """Entry point of a worker process: jobs_per_worker threads taking jobs from this worker's queue."""
+    _init_worker(store_path, warm, workers)
+    threads = [Thread(target=_job_loop, args=(jobs, events)) for _ in range(jobs_per_worker)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _resolve(future: asyncio.Future, result=None, error: Optional[Exception] = None):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class _PendingJob:
+    def __init__(self, item: tuple, loop: asyncio.AbstractEventLoop):
+        self.item = item
+        self.loop = loop
+        self.started = loop.create_future()
+        self.done = loop.create_future()
+        self.pid: Optional[int] = None
+
+    def resolve(self, future: asyncio.Future, result=None, error: Optional[Exception] = None):
+        self.loop.call_soon_threadsafe(_resolve, future, result, error)
+
+
+class ResearchWorkerPool:
+    """
+    Runs research jobs in a pool of worker processes, several jobs per worker.
+
+    Each worker has its own job queue and runs up to jobs_per_worker jobs on
+    threads. The API process hands jobs to the least busy worker with a free
+    slot and holds the rest in a backlog. Progress events and results come
+    back over a shared queue; events are recorded in the job store, which
+    (like the search cache) lives in a SQLite file every worker can reach. A
+    worker that dies is replaced and its jobs are failed.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        store_path: str = DEFAULT_STORE_PATH,
+        jobs_per_worker: int = RESEARCH_JOBS_PER_WORKER,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.jobs_per_worker = max(1, jobs_per_worker)
+        self.jobs = JobStore(store_path)
+        self._metrics = MetricsStore(store_path)
+        self._metrics.clear()
+        self._store_path = store_path
+        self._warm = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+
+        self._context = multiprocessing.get_context(os.getenv("RESEARCH_START_METHOD", "spawn"))
+        # Manager queues: a worker killed mid-call cannot leave them locked.
+        self._manager = self._context.Manager()
+        self._events = self._manager.Queue()
+        self._lock = Lock()
+        self._closed = False
+        self._processes = {}
+        self._active = {}
+        self._backlog = deque()
+        self._pending = {}
+
+        # All workers are started (and warmed up) now rather than on the first jobs.
+        for _ in range(self.workers):
+            self._start_worker()
+
+        self._event_thread = Thread(target=self._drain_events, daemon=True)
+        self._event_thread.start()
+        self._monitor_thread = Thread(target=self._monitor_workers, daemon=True)
+        self._monitor_thread.start()
+
+    def _start_worker(self):
+        jobs = self._manager.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self._store_path, self._warm, self.workers, self.jobs_per_worker, jobs, self._events),
+            daemon=True,
+        )
+        process.start()
+        with self._lock:
+            self._processes[process.pid] = (process, jobs)
+            self._active[process.pid] = set()
+
+    def _dispatch(self):
+        """Hand backlog jobs to the least busy workers with free slots. Called with the lock held."""
+        while self._backlog:
+            free = [pid for pid, active in self._active.items() if len(active) < self.jobs_per_worker]
+            if not free:
+                return
+            pid = min(free, key=lambda pid: len(self._active[pid]))
+            pending = self._backlog.popleft()
+            pending.pid = pid
+            self._active[pid].add(pending.item[0])
+            self._processes[pid][1].put(pending.item)
+
+    def _finish(self, job_id: str) -> Optional[_PendingJob]:
+        """Free the slot of a finished job. Called with the lock held."""
+        pending = self._pending.pop(job_id, None)
+        if pending is not None and pending.pid in self._active:
+            self._active[pending.pid].discard(job_id)
+        self._dispatch()
+        return pending
+
+    def _drain_events(self):
+        while True:
+            item = self._events.get()
+            if item is None:
+                return
+            kind, job_id, payload = item
+            if kind == "event":
+                self.jobs.add_event(job_id, payload)
+                continue
+            with self._lock:
+                pending = self._pending.get(job_id) if kind == "started" else self._finish(job_id)
+            if pending is None:
+                continue
+            if kind == "started":
+                pending.resolve(pending.started)
+            elif kind == "result":
+                pending.resolve(pending.done, payload)
+            else:
+                pending.resolve(pending.done, error=RuntimeError(payload))
+
+    def _monitor_workers(self):
+        """Replace workers that exit and fail the jobs they were running."""
+        while not self._closed:
+            with self._lock:
+                sentinels = {process.sentinel: pid for pid, (process, _) in self._processes.items()}
+            for sentinel in wait_for_sentinels(list(sentinels), timeout=1.0):
+                pid = sentinels[sentinel]
+                with self._lock:
+                    if self._closed:
+                        return
+                    self._processes.pop(pid, None)
+                    lost = [self._pending.get(job_id) for job_id in self._active.pop(pid, set())]
+                    for pending in lost:
+                        if pending is not None:
+                            self._pending.pop(pending.item[0], None)
+                logger.error("Research worker %s exited; %d job(s) lost", pid, len(lost))
+                for pending in lost:
+                    if pending is not None:
+                        self.jobs.update(pending.item[0], "failed", error="Worker process terminated abruptly")
+                        pending.resolve(pending.done, error=WorkerCrashed(f"Worker {pid} exited"))
+                self._start_worker()
+                with self._lock:
+                    self._dispatch()
+
+    async def run(self, job_id: str, query: str, mode: str, session_id: Optional[str], timeout: float) -> str:
+        """
+        Queue a job and wait for its result. The timeout counts from when the
+        job starts running, not from when it was queued; raises
+        asyncio.TimeoutError on timeout or after RESEARCH_QUEUE_TIMEOUT in the queue.
+        """
+        pending = _PendingJob((job_id, query, mode, session_id), asyncio.get_running_loop())
+        with self._lock:
+            self._pending[job_id] = pending
+            self._backlog.append(pending)
+            self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(pending.started), RESEARCH_QUEUE_TIMEOUT)
+            return await asyncio.wait_for(asyncio.shield(pending.done), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if pending in self._backlog:
+                    # Never started: drop it so it does not run later.
+                    self._backlog.remove(pending)
+                    self._pending.pop(job_id, None)
+            # A running job cannot be interrupted; it finishes in the background
+            # (keeping its slot) but its result is no longer awaited.
+            self.jobs.update(job_id, "timeout")
+            raise
+        except asyncio.CancelledError:
+            with self._lock:
+                if pending in self._backlog:
+                    self._backlog.remove(pending)
+                    self._pending.pop(job_id, None)
+            raise
+
+    def metrics(self) -> dict:
+        """Latest metrics published by each worker process, keyed by pid."""
+        return self._metrics.all()
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            processes = list(self._processes.values())
+        for process, jobs in processes:
+            for _ in range(self.jobs_per_worker):
+                jobs.put(None)
+        for process, _ in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._events.put(None)
+        self._event_thread.join(timeout=5)
+        self._manager.shutdown()